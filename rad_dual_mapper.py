@@ -33,31 +33,31 @@ def create_dual_output_dataframe(loinc_results, icd10pcs_results):
     for loinc_result, icd10pcs_result in zip(loinc_results, icd10pcs_results):
         # Combine issues from both mappings
         all_issues = set()
-        if loinc_result['issues']:
-            all_issues.update([f"LOINC: {issue}" for issue in loinc_result['issues']])
+        if loinc_result.issues:
+            all_issues.update([f"LOINC: {issue}" for issue in loinc_result.issues])
         if icd10pcs_result['issues']:
             all_issues.update([f"ICD-10-PCS: {issue}" for issue in icd10pcs_result['issues']])
 
-        has_any_issues = loinc_result['has_issues'] or icd10pcs_result['has_issues']
+        has_any_issues = loinc_result.has_issues or icd10pcs_result['has_issues']
 
         row = {
-            'value_code': loinc_result['value_code'],
-            'modality': loinc_result['modality'],
-            'Study Description': loinc_result['study_description'],
-            'Chinese Study Description': loinc_result['chinese_description'],
-            'Contrast': loinc_result['contrast'],
-            'Combine Modality': loinc_result['combine_modality'],
-            'Primary Modality': loinc_result['primary_modality'],
-            'Expanded Description': loinc_result['expanded_description'],
-            'Body Parts': ', '.join(loinc_result['body_parts']),
-            'Laterality': loinc_result['laterality'] if loinc_result['laterality'] else '',
+            'value_code': loinc_result.value_code,
+            'modality': loinc_result.modality,
+            'Study Description': loinc_result.study_description,
+            'Chinese Study Description': loinc_result.chinese_description,
+            'Contrast': loinc_result.contrast,
+            'Combine Modality': loinc_result.combine_modality,
+            'Primary Modality': loinc_result.primary_modality,
+            'Expanded Description': loinc_result.expanded_description,
+            'Body Parts': ', '.join(loinc_result.body_parts),
+            'Laterality': loinc_result.laterality if loinc_result.laterality else '',
 
             # LOINC columns
-            'LOINC Code': loinc_result['loinc_code'] if loinc_result['loinc_code'] else '',
-            'LOINC Name': loinc_result['loinc_long_name'] if loinc_result['loinc_long_name'] else '',
-            'LOINC Component': loinc_result['loinc_component'] if loinc_result['loinc_component'] else '',
-            'LOINC Method': loinc_result['loinc_method'] if loinc_result['loinc_method'] else '',
-            'LOINC Confidence': loinc_result['mapping_confidence'],
+            'LOINC Code': loinc_result.loinc_code if loinc_result.loinc_code else '',
+            'LOINC Name': loinc_result.loinc_long_name if loinc_result.loinc_long_name else '',
+            'LOINC Component': loinc_result.loinc_component if loinc_result.loinc_component else '',
+            'LOINC Method': loinc_result.loinc_method if loinc_result.loinc_method else '',
+            'LOINC Confidence': loinc_result.mapping_confidence,
 
             # ICD-10-PCS columns
             'ICD-10-PCS Code': icd10pcs_result['icd10pcs_code'] if icd10pcs_result['icd10pcs_code'] else '',
@@ -91,10 +91,10 @@ def generate_dual_summary(loinc_results, icd10pcs_results):
     total = len(loinc_results)
 
     # LOINC stats
-    loinc_mapped = sum(1 for r in loinc_results if r['loinc_code'])
-    loinc_high = sum(1 for r in loinc_results if r['mapping_confidence'] == 'High')
-    loinc_low = sum(1 for r in loinc_results if r['mapping_confidence'] == 'Low')
-    loinc_none = sum(1 for r in loinc_results if r['mapping_confidence'] == 'None')
+    loinc_mapped = sum(1 for r in loinc_results if r.loinc_code)
+    loinc_high = sum(1 for r in loinc_results if r.mapping_confidence == 'High')
+    loinc_low = sum(1 for r in loinc_results if r.mapping_confidence == 'Low')
+    loinc_none = sum(1 for r in loinc_results if r.mapping_confidence == 'None')
 
     # ICD-10-PCS stats
     icd10pcs_mapped = sum(1 for r in icd10pcs_results if r['icd10pcs_code'])
@@ -103,15 +103,15 @@ def generate_dual_summary(loinc_results, icd10pcs_results):
 
     # Combined stats
     both_mapped = sum(1 for l, i in zip(loinc_results, icd10pcs_results)
-                     if l['loinc_code'] and i['icd10pcs_code'])
+                     if l.loinc_code and i['icd10pcs_code'])
 
     with_issues = sum(1 for l, i in zip(loinc_results, icd10pcs_results)
-                     if l['has_issues'] or i['has_issues'])
+                     if l.has_issues or i['has_issues'])
 
     # Count by modality
     modality_counts = {}
     for r in loinc_results:
-        mod = r['primary_modality']
+        mod = r.primary_modality
         modality_counts[mod] = modality_counts.get(mod, 0) + 1
 
     summary = {
@@ -246,11 +246,11 @@ Optional Excel columns:
         if args.verbose:
             print("\nStudies with issues:")
             for loinc_r, icd10pcs_r in zip(loinc_results, icd10pcs_results):
-                if loinc_r['has_issues'] or icd10pcs_r['has_issues']:
-                    print(f"\n{loinc_r['value_code']} - {loinc_r['study_description']}")
-                    if loinc_r['issues']:
+                if loinc_r.has_issues or icd10pcs_r['has_issues']:
+                    print(f"\n{loinc_r.value_code} - {loinc_r.study_description}")
+                    if loinc_r.issues:
                         print(f"  LOINC issues:")
-                        for issue in loinc_r['issues']:
+                        for issue in loinc_r.issues:
                             print(f"    - {issue}")
                     if icd10pcs_r['issues']:
                         print(f"  ICD-10-PCS issues:")
@@ -75,12 +75,9 @@ Optional Excel columns:
         df = processor.read_excel(args.input)
         print(f"Found {len(df)} studies to process")
 
-        # Prepare studies
-        studies = processor.prepare_studies(df)
-
         # Map to LOINC
         print("\nMapping studies to LOINC codes...")
-        results = mapper.map_batch(studies)
+        results = mapper.map_batch_df(df)
 
         # Generate summary
         summary = processor.generate_summary(results)
@@ -103,9 +100,9 @@ Optional Excel columns:
         if args.verbose:
             print("\nStudies with issues:")
             for result in results:
-                if result['has_issues']:
-                    print(f"\n{result['value_code']} - {result['study_description']}")
-                    for issue in result['issues']:
+                if result.has_issues:
+                    print(f"\n{result.value_code} - {result.study_description}")
+                    for issue in result.issues:
                         print(f"  - {issue}")
 
         print("\nMapping completed successfully!")
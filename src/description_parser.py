@@ -9,6 +9,13 @@ from .medical_terminology import (
     LATERALITY, CHINESE_LATERALITY, CONTRAST_KEYWORDS, CHINESE_CONTRAST
 )
 
+# pyahocorasick is optional; it finds all body-part keywords in one pass
+try:
+    import ahocorasick
+    AHOCORASICK_AVAILABLE = True
+except ImportError:
+    AHOCORASICK_AVAILABLE = False
+
 
 class DescriptionParser:
     """Parse radiology study descriptions to extract body parts, laterality, etc."""
@@ -22,6 +29,24 @@ class DescriptionParser:
         self.contrast_keywords = CONTRAST_KEYWORDS
         self.chinese_contrast = CHINESE_CONTRAST
 
+        # Word-boundary pattern per body-part keyword, compiled once
+        self._body_part_patterns = [
+            (keyword, standardized, re.compile(r'\b' + re.escape(keyword) + r'\b'))
+            for keyword, standardized in self.body_parts.items()
+        ]
+        self._body_part_automaton = None
+        if AHOCORASICK_AVAILABLE:
+            self._body_part_automaton = ahocorasick.Automaton()
+            for keyword in self.body_parts:
+                self._body_part_automaton.add_word(keyword, keyword)
+            self._body_part_automaton.make_automaton()
+
+    def _body_part_candidates(self, text_lower: str) -> set:
+        """Body-part keywords occurring in text as substrings (superset of word matches)"""
+        if self._body_part_automaton is not None:
+            return {keyword for _, keyword in self._body_part_automaton.iter(text_lower)}
+        return {keyword for keyword in self.body_parts if keyword in text_lower}
+
     def expand_abbreviations(self, text: str) -> str:
         """Expand medical abbreviations in text"""
         if not text:
@@ -44,10 +69,11 @@ class DescriptionParser:
             expanded_text = self.expand_abbreviations(text)
             text_lower = expanded_text.lower()
 
-            # Extract from English text
-            for keyword, standardized in self.body_parts.items():
-                pattern = r'\b' + re.escape(keyword) + r'\b'
-                if re.search(pattern, text_lower):
+            # Extract from English text; only keywords present as substrings
+            # need the word-boundary check
+            candidates = self._body_part_candidates(text_lower)
+            for keyword, standardized, pattern in self._body_part_patterns:
+                if keyword in candidates and pattern.search(text_lower):
                     if standardized not in body_parts:
                         body_parts.append(standardized)
 
@@ -175,3 +201,42 @@ class DescriptionParser:
                 return modality
 
         return modality_list[0] if modality_list else ""
+
+
+# Input columns of a study, in the order the mappers take them
+STUDY_COLUMNS = [
+    'modality', 'Study Description', 'Chinese Study Description',
+    'Contrast', 'Combine Modality'
+]
+
+
+def factorize_studies(df) -> Tuple[List, List[int], List[Tuple[str, ...]]]:
+    """
+    Factorize a DataFrame of studies on their input signature
+
+    Missing study columns and null values (NaN, or NA in Arrow-backed
+    frames) are read as empty strings. Value codes are passed through as
+    read (e.g. integer codes stay integers).
+
+    Args:
+        df: DataFrame with value_code and the STUDY_COLUMNS
+
+    Returns:
+        (value_codes, signature_ids, signatures): the value code of each
+        row, the index of each row's signature, and the distinct
+        signatures as tuples in STUDY_COLUMNS order
+    """
+    import pandas as pd
+
+    # MultiIndex.from_frame cannot factorize a frame without rows
+    if len(df) == 0:
+        return [], [], []
+
+    df = df.reindex(columns=STUDY_COLUMNS + ['value_code'], fill_value='')
+    inputs = pd.DataFrame({
+        column: df[column].to_numpy(dtype=object, na_value='').astype(str)
+        for column in STUDY_COLUMNS
+    })
+
+    signature_ids, signatures = pd.factorize(pd.MultiIndex.from_frame(inputs))
+    return df['value_code'].to_numpy(dtype=object), signature_ids, list(signatures)
@@ -7,6 +7,8 @@ from typing import List, Dict, Optional
 from pathlib import Path
 import datetime
 
+from .loinc_mapper import MappingResult
+
 
 class ExcelProcessor:
     """Process Excel files for radiology LOINC mapping"""
@@ -88,12 +90,12 @@ class ExcelProcessor:
             studies.append(study)
         return studies
 
-    def create_output_dataframe(self, mapping_results: List[Dict]) -> pd.DataFrame:
+    def create_output_dataframe(self, mapping_results: List[MappingResult]) -> pd.DataFrame:
         """
         Create output DataFrame from mapping results
 
         Args:
-            mapping_results: List of mapping result dictionaries
+            mapping_results: List of LOINC mapping results
 
         Returns:
             DataFrame with results
@@ -102,23 +104,23 @@ class ExcelProcessor:
 
         for result in mapping_results:
             row = {
-                'value_code': result['value_code'],
-                'modality': result['modality'],
-                'Study Description': result['study_description'],
-                'Chinese Study Description': result['chinese_description'],
-                'Contrast': result['contrast'],
-                'Combine Modality': result['combine_modality'],
-                'Primary Modality': result['primary_modality'],
-                'Expanded Description': result['expanded_description'],
-                'Body Parts': ', '.join(result['body_parts']),
-                'Laterality': result['laterality'] if result['laterality'] else '',
-                'LOINC Code': result['loinc_code'] if result['loinc_code'] else '',
-                'LOINC Name': result['loinc_long_name'] if result['loinc_long_name'] else '',
-                'LOINC Component': result['loinc_component'] if result['loinc_component'] else '',
-                'LOINC Method': result['loinc_method'] if result['loinc_method'] else '',
-                'Mapping Confidence': result['mapping_confidence'],
-                'Has Issues': 'Yes' if result['has_issues'] else 'No',
-                'Issues': '; '.join(result['issues']) if result['issues'] else ''
+                'value_code': result.value_code,
+                'modality': result.modality,
+                'Study Description': result.study_description,
+                'Chinese Study Description': result.chinese_description,
+                'Contrast': result.contrast,
+                'Combine Modality': result.combine_modality,
+                'Primary Modality': result.primary_modality,
+                'Expanded Description': result.expanded_description,
+                'Body Parts': ', '.join(result.body_parts),
+                'Laterality': result.laterality if result.laterality else '',
+                'LOINC Code': result.loinc_code if result.loinc_code else '',
+                'LOINC Name': result.loinc_long_name if result.loinc_long_name else '',
+                'LOINC Component': result.loinc_component if result.loinc_component else '',
+                'LOINC Method': result.loinc_method if result.loinc_method else '',
+                'Mapping Confidence': result.mapping_confidence,
+                'Has Issues': 'Yes' if result.has_issues else 'No',
+                'Issues': '; '.join(result.issues) if result.issues else ''
             }
             output_data.append(row)
 
@@ -166,7 +168,7 @@ class ExcelProcessor:
         except Exception as e:
             raise Exception(f"Error writing Excel file: {str(e)}")
 
-    def generate_summary(self, mapping_results: List[Dict]) -> Dict:
+    def generate_summary(self, mapping_results: List[MappingResult]) -> Dict:
         """
         Generate summary statistics from mapping results
 
@@ -177,16 +179,16 @@ class ExcelProcessor:
             Dictionary with summary statistics
         """
         total = len(mapping_results)
-        with_loinc = sum(1 for r in mapping_results if r['loinc_code'])
-        with_issues = sum(1 for r in mapping_results if r['has_issues'])
-        high_confidence = sum(1 for r in mapping_results if r['mapping_confidence'] == 'High')
-        low_confidence = sum(1 for r in mapping_results if r['mapping_confidence'] == 'Low')
-        no_mapping = sum(1 for r in mapping_results if r['mapping_confidence'] == 'None')
+        with_loinc = sum(1 for r in mapping_results if r.loinc_code)
+        with_issues = sum(1 for r in mapping_results if r.has_issues)
+        high_confidence = sum(1 for r in mapping_results if r.mapping_confidence == 'High')
+        low_confidence = sum(1 for r in mapping_results if r.mapping_confidence == 'Low')
+        no_mapping = sum(1 for r in mapping_results if r.mapping_confidence == 'None')
 
         # Count by modality
         modality_counts = {}
         for r in mapping_results:
-            mod = r['primary_modality']
+            mod = r.primary_modality
             modality_counts[mod] = modality_counts.get(mod, 0) + 1
 
         summary = {
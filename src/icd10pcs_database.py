@@ -29,6 +29,8 @@ Qualifiers (Characters 6-7):
 - Z: None
 """
 
+from types import MappingProxyType
+
 # ICD-10-PCS codes for common radiology procedures
 # Format: (body_part, modality, laterality, contrast) -> ICD-10-PCS code
 ICD10PCS_DATABASE = {
@@ -587,6 +589,10 @@ ICD10PCS_DATABASE = {
     },
 }
 
+# Entries are returned to every caller without copying; store them as
+# read-only views so a caller cannot modify the shared table
+ICD10PCS_DATABASE = {key: MappingProxyType(entry) for key, entry in ICD10PCS_DATABASE.items()}
+
 # Modality to ICD-10-PCS Root Type mapping
 MODALITY_TO_ROOT_TYPE = {
     'CR': '0',  # Plain Radiography
@@ -4,12 +4,15 @@ ICD-10-PCS code mapper for radiology procedures
 
 from typing import Dict, Optional, List, Tuple
 from .icd10pcs_database import ICD10PCS_DATABASE, MODALITY_TO_ROOT_TYPE
-from .description_parser import DescriptionParser
+from .description_parser import DescriptionParser, factorize_studies
 
 
 class ICD10PCSMapper:
     """Map radiology studies to ICD-10-PCS codes"""
 
+    # Body parts to exclude (often false positives from abbreviations)
+    _EXCLUDE_BODY_PARTS = frozenset({'Face', 'Bone'})
+
     def __init__(self):
         self.icd10pcs_db = ICD10PCS_DATABASE
         self.modality_map = MODALITY_TO_ROOT_TYPE
@@ -32,19 +35,10 @@ class ICD10PCSMapper:
         Returns:
             Filtered list of body parts
         """
-        # Body parts to exclude (often false positives from abbreviations)
-        exclude_list = ['Face', 'Bone']
-
-        filtered = []
-        for part in body_parts:
-            if part not in exclude_list:
-                filtered.append(part)
+        filtered = [part for part in body_parts if part not in self._EXCLUDE_BODY_PARTS]
 
         # If filtering removed everything, keep original list
-        if not filtered and body_parts:
-            return body_parts
-
-        return filtered
+        return filtered or body_parts
 
     def _select_best_icd10pcs(self, icd10pcs_codes: List[Tuple[str, Dict]], body_parts: List[str]) -> Tuple[str, Dict]:
         """
@@ -96,7 +90,7 @@ class ICD10PCSMapper:
             contrast: Y/N/N+Y
 
         Returns:
-            Dictionary with ICD-10-PCS code and metadata, or None if not found
+            Read-only mapping with ICD-10-PCS code and metadata, or None if not found
         """
         # Normalize modality
         root_type = self.normalize_modality(modality)
@@ -116,14 +110,14 @@ class ICD10PCSMapper:
         for contrast_val in contrast_values:
             # Try with laterality first
             if laterality:
-                key = (body_part, modality, laterality, contrast_val)
-                if key in self.icd10pcs_db:
-                    return self.icd10pcs_db[key].copy()
+                icd10pcs_info = self.icd10pcs_db.get((body_part, modality, laterality, contrast_val))
+                if icd10pcs_info is not None:
+                    return icd10pcs_info
 
             # Try without laterality
-            key = (body_part, modality, None, contrast_val)
-            if key in self.icd10pcs_db:
-                return self.icd10pcs_db[key].copy()
+            icd10pcs_info = self.icd10pcs_db.get((body_part, modality, None, contrast_val))
+            if icd10pcs_info is not None:
+                return icd10pcs_info
 
         return None
 
@@ -234,6 +228,7 @@ class ICD10PCSMapper:
         if contrast == 'N+Y':
             result['issues'].append('Both contrast and non-contrast - ICD-10-PCS code may need separate entries')
 
+        result['issues_prefixed'] = [f"ICD-10-PCS: {issue}" for issue in result['issues']]
         return result
 
     def map_batch(self, studies: List[Dict]) -> List[Dict]:
@@ -258,3 +253,35 @@ class ICD10PCSMapper:
             )
             results.append(result)
         return results
+
+    def map_batch_df(self, df) -> List[Dict]:
+        """
+        Map a DataFrame of studies to ICD-10-PCS codes
+
+        Rows are factorized on their input signature so each distinct
+        study is parsed and mapped once, then joined back to its rows.
+
+        Args:
+            df: DataFrame with the input columns (value_code, modality,
+                Study Description, Chinese Study Description, Contrast,
+                Combine Modality); missing columns and null values are
+                treated as empty
+
+        Returns:
+            List of mapping results, in row order
+        """
+        value_codes, signature_ids, signatures = factorize_studies(df)
+        mappings = [self.map_study_to_icd10pcs('', *signature) for signature in signatures]
+
+        results = []
+        for value_code, signature_id in zip(value_codes, signature_ids):
+            mapping = mappings[signature_id]
+            # Rows with the same signature share a mapping; give each its own lists
+            results.append({
+                **mapping,
+                'value_code': value_code,
+                'body_parts': list(mapping['body_parts']),
+                'issues': list(mapping['issues']),
+                'issues_prefixed': list(mapping['issues_prefixed'])
+            })
+        return results
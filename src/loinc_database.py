@@ -6,378 +6,124 @@ Component: [Body Part] [Laterality] [Protocol]
 Method: [Modality]
 """
 
-# Common LOINC codes for radiology studies
-# Format: (body_part, modality, laterality, contrast) -> LOINC code
-LOINC_DATABASE = {
-    # Chest X-ray
-    ('Chest', 'CR', None, 'N'): {
-        'code': '36643-5',
-        'long_name': 'XR Chest Views',
-        'component': 'Chest',
-        'method': 'XR'
-    },
-    ('Chest', 'XR', None, 'N'): {
-        'code': '36643-5',
-        'long_name': 'XR Chest Views',
-        'component': 'Chest',
-        'method': 'XR'
-    },
-
-    # Chest CT
-    ('Chest', 'CT', None, 'N'): {
-        'code': '24627-2',
-        'long_name': 'CT Chest W/O contrast',
-        'component': 'Chest',
-        'method': 'CT'
-    },
-    ('Chest', 'CT', None, 'Y'): {
-        'code': '24626-4',
-        'long_name': 'CT Chest W contrast IV',
-        'component': 'Chest',
-        'method': 'CT'
-    },
-
-    # Abdomen CT
-    ('Abdomen', 'CT', None, 'N'): {
-        'code': '24640-5',
-        'long_name': 'CT Abdomen W/O contrast',
-        'component': 'Abdomen',
-        'method': 'CT'
-    },
-    ('Abdomen', 'CT', None, 'Y'): {
-        'code': '24639-7',
-        'long_name': 'CT Abdomen W contrast IV',
-        'component': 'Abdomen',
-        'method': 'CT'
-    },
-
-    # Brain CT
-    ('Brain', 'CT', None, 'N'): {
-        'code': '24558-9',
-        'long_name': 'CT Head W/O contrast',
-        'component': 'Head',
-        'method': 'CT'
-    },
-    ('Brain', 'CT', None, 'Y'): {
-        'code': '24557-1',
-        'long_name': 'CT Head W contrast IV',
-        'component': 'Head',
-        'method': 'CT'
-    },
-    ('Head', 'CT', None, 'N'): {
-        'code': '24558-9',
-        'long_name': 'CT Head W/O contrast',
-        'component': 'Head',
-        'method': 'CT'
-    },
-    ('Head', 'CT', None, 'Y'): {
-        'code': '24557-1',
-        'long_name': 'CT Head W contrast IV',
-        'component': 'Head',
-        'method': 'CT'
-    },
-
-    # Brain MRI
-    ('Brain', 'MR', None, 'N'): {
-        'code': '24556-3',
-        'long_name': 'MRI Brain W/O contrast',
-        'component': 'Brain',
-        'method': 'MRI'
-    },
-    ('Brain', 'MR', None, 'Y'): {
-        'code': '24555-5',
-        'long_name': 'MRI Brain W contrast IV',
-        'component': 'Brain',
-        'method': 'MRI'
-    },
-    ('Brain', 'MRI', None, 'Y'): {
-        'code': '24555-5',
-        'long_name': 'MRI Brain W contrast IV',
-        'component': 'Brain',
-        'method': 'MRI'
-    },
-    ('Brain', 'MRI', None, 'N'): {
-        'code': '24556-3',
-        'long_name': 'MRI Brain W/O contrast',
-        'component': 'Brain',
-        'method': 'MRI'
-    },
-
-    # Spine
-    ('Cervical spine', 'CR', None, 'N'): {
-        'code': '36713-6',
-        'long_name': 'XR Cervical spine',
-        'component': 'Cervical spine',
-        'method': 'XR'
-    },
-    ('Cervical spine', 'CT', None, 'N'): {
-        'code': '24800-5',
-        'long_name': 'CT Cervical spine W/O contrast',
-        'component': 'Cervical spine',
-        'method': 'CT'
-    },
-    ('Cervical spine', 'MR', None, 'N'): {
-        'code': '24852-6',
-        'long_name': 'MRI Cervical spine W/O contrast',
-        'component': 'Cervical spine',
-        'method': 'MRI'
-    },
-    ('Cervical spine', 'MRI', None, 'N'): {
-        'code': '24852-6',
-        'long_name': 'MRI Cervical spine W/O contrast',
-        'component': 'Cervical spine',
-        'method': 'MRI'
-    },
-    ('Lumbar spine', 'CR', None, 'N'): {
-        'code': '36714-4',
-        'long_name': 'XR Lumbar spine',
-        'component': 'Lumbar spine',
-        'method': 'XR'
-    },
-    ('Lumbar spine', 'XR', None, 'N'): {
-        'code': '36714-4',
-        'long_name': 'XR Lumbar spine',
-        'component': 'Lumbar spine',
-        'method': 'XR'
-    },
-    ('Lumbar spine', 'CT', None, 'N'): {
-        'code': '24802-1',
-        'long_name': 'CT Lumbar spine W/O contrast',
-        'component': 'Lumbar spine',
-        'method': 'CT'
-    },
-    ('Lumbar spine', 'MR', None, 'N'): {
-        'code': '24860-9',
-        'long_name': 'MRI Lumbar spine W/O contrast',
-        'component': 'Lumbar spine',
-        'method': 'MRI'
-    },
-    ('Lumbar spine', 'MRI', None, 'N'): {
-        'code': '24860-9',
-        'long_name': 'MRI Lumbar spine W/O contrast',
-        'component': 'Lumbar spine',
-        'method': 'MRI'
-    },
-
-    # Extremities - Hand
-    ('Hand', 'CR', 'Right', 'N'): {
-        'code': '37362-0',
-        'long_name': 'XR Hand - right',
-        'component': 'Hand - right',
-        'method': 'XR'
-    },
-    ('Hand', 'XR', 'Right', 'N'): {
-        'code': '37362-0',
-        'long_name': 'XR Hand - right',
-        'component': 'Hand - right',
-        'method': 'XR'
-    },
-    ('Hand', 'CR', 'Left', 'N'): {
-        'code': '37361-2',
-        'long_name': 'XR Hand - left',
-        'component': 'Hand - left',
-        'method': 'XR'
-    },
-    ('Hand', 'XR', 'Left', 'N'): {
-        'code': '37361-2',
-        'long_name': 'XR Hand - left',
-        'component': 'Hand - left',
-        'method': 'XR'
-    },
-    # Extremities - Knee
-    ('Knee', 'CR', 'Right', 'N'): {
-        'code': '37628-4',
-        'long_name': 'XR Knee - right',
-        'component': 'Knee - right',
-        'method': 'XR'
-    },
-    ('Knee', 'XR', 'Right', 'N'): {
-        'code': '37628-4',
-        'long_name': 'XR Knee - right',
-        'component': 'Knee - right',
-        'method': 'XR'
-    },
-    ('Knee', 'CR', 'Left', 'N'): {
-        'code': '37627-6',
-        'long_name': 'XR Knee - left',
-        'component': 'Knee - left',
-        'method': 'XR'
-    },
-    ('Knee', 'XR', 'Left', 'N'): {
-        'code': '37627-6',
-        'long_name': 'XR Knee - left',
-        'component': 'Knee - left',
-        'method': 'XR'
-    },
-    ('Knee', 'CR', 'Bilateral', 'N'): {
-        'code': '69161-8',
-        'long_name': 'XR Knee - bilateral',
-        'component': 'Knee - bilateral',
-        'method': 'XR'
-    },
-    ('Knee', 'XR', 'Bilateral', 'N'): {
-        'code': '69161-8',
-        'long_name': 'XR Knee - bilateral',
-        'component': 'Knee - bilateral',
-        'method': 'XR'
-    },
-    ('Knee', 'MR', 'Right', 'N'): {
-        'code': '24876-5',
-        'long_name': 'MRI Knee - right W/O contrast',
-        'component': 'Knee - right',
-        'method': 'MRI'
-    },
-    ('Knee', 'MRI', 'Right', 'N'): {
-        'code': '24876-5',
-        'long_name': 'MRI Knee - right W/O contrast',
-        'component': 'Knee - right',
-        'method': 'MRI'
-    },
-    ('Knee', 'MR', 'Left', 'N'): {
-        'code': '24875-7',
-        'long_name': 'MRI Knee - left W/O contrast',
-        'component': 'Knee - left',
-        'method': 'MRI'
-    },
-    ('Knee', 'MRI', 'Left', 'N'): {
-        'code': '24875-7',
-        'long_name': 'MRI Knee - left W/O contrast',
-        'component': 'Knee - left',
-        'method': 'MRI'
-    },
-
-    # Pelvis
-    ('Pelvis', 'CR', None, 'N'): {
-        'code': '37748-0',
-        'long_name': 'XR Pelvis',
-        'component': 'Pelvis',
-        'method': 'XR'
-    },
-    ('Pelvis', 'XR', None, 'N'): {
-        'code': '37748-0',
-        'long_name': 'XR Pelvis',
-        'component': 'Pelvis',
-        'method': 'XR'
-    },
-    ('Pelvis', 'CT', None, 'N'): {
-        'code': '24907-8',
-        'long_name': 'CT Pelvis W/O contrast',
-        'component': 'Pelvis',
-        'method': 'CT'
-    },
-    ('Pelvis', 'MR', None, 'N'): {
-        'code': '24926-8',
-        'long_name': 'MRI Pelvis W/O contrast',
-        'component': 'Pelvis',
-        'method': 'MRI'
-    },
-
-    # Abdomen and Pelvis
-    ('Abdomen', 'CT', None, 'Y'): {
-        'code': '79101-4',
-        'long_name': 'CT Abdomen and Pelvis W contrast IV',
-        'component': 'Abdomen and Pelvis',
-        'method': 'CT'
-    },
-
-    # Ultrasound
-    ('Abdomen', 'US', None, 'N'): {
-        'code': '30704-1',
-        'long_name': 'US Abdomen',
-        'component': 'Abdomen',
-        'method': 'US'
-    },
-    ('Liver', 'US', None, 'N'): {
-        'code': '30705-8',
-        'long_name': 'US Liver',
-        'component': 'Liver',
-        'method': 'US'
-    },
-    ('Kidney', 'US', None, 'N'): {
-        'code': '24642-1',
-        'long_name': 'US Kidney',
-        'component': 'Kidney',
-        'method': 'US'
-    },
-    ('Kidney', 'US', 'Bilateral', 'N'): {
-        'code': '24642-1',
-        'long_name': 'US Kidney bilateral',
-        'component': 'Kidney',
-        'method': 'US'
-    },
-
-    # KUB (Kidney Ureter Bladder)
-    ('Kidney', 'CT', None, 'N'): {
-        'code': '24645-4',
-        'long_name': 'CT Kidney W/O contrast',
-        'component': 'Kidney',
-        'method': 'CT'
-    },
-    ('Ureter', 'CT', None, 'N'): {
-        'code': '72171-2',
-        'long_name': 'CT Ureter',
-        'component': 'Ureter',
-        'method': 'CT'
-    },
-    ('Bladder', 'CT', None, 'N'): {
-        'code': '24538-1',
-        'long_name': 'CT Bladder W/O contrast',
-        'component': 'Bladder',
-        'method': 'CT'
-    },
-
-    # Heart and Vascular
-    ('Heart', 'XA', None, 'Y'): {
-        'code': '42798-6',
-        'long_name': 'XA Heart',
-        'component': 'Heart',
-        'method': 'XA'
-    },
-    ('Heart', 'Angio', None, 'Y'): {
-        'code': '42798-6',
-        'long_name': 'Angiography Heart',
-        'component': 'Heart',
-        'method': 'Angio'
-    },
-    ('Coronary artery', 'XA', None, 'Y'): {
-        'code': '42798-6',
-        'long_name': 'XA Coronary arteries',
-        'component': 'Coronary artery',
-        'method': 'XA'
-    },
-    ('Coronary artery', 'Angio', None, 'Y'): {
-        'code': '42798-6',
-        'long_name': 'Angiography Coronary arteries',
-        'component': 'Coronary artery',
-        'method': 'Angio'
-    },
-
-    # Bone density
-    ('Spine', 'BMD', None, 'N'): {
-        'code': '38262-7',
-        'long_name': 'DXA Bone density in Spine',
-        'component': 'Spine',
-        'method': 'DXA'
-    },
-    ('Spine', 'DXA', None, 'N'): {
-        'code': '38262-7',
-        'long_name': 'DXA Bone density in Spine',
-        'component': 'Spine',
-        'method': 'DXA'
-    },
-    ('Hip', 'BMD', None, 'N'): {
-        'code': '38263-5',
-        'long_name': 'DXA Bone density in Hip',
-        'component': 'Hip',
-        'method': 'DXA'
-    },
-    ('Hip', 'DXA', None, 'N'): {
-        'code': '38263-5',
-        'long_name': 'DXA Bone density in Hip',
-        'component': 'Hip',
-        'method': 'DXA'
-    },
-}
+import csv
+import sys
+from types import MappingProxyType
+from typing import NamedTuple
+
+
+class LoincRecord(NamedTuple):
+    """LOINC entry for one (body_part, modality, laterality, contrast) key"""
+    code: str
+    long_name: str
+    component: str
+    method: str
+
+
+# Common LOINC codes for radiology studies, one CSV row per table key.
+# Lines starting with '#' are comments; an empty laterality means none.
+_RAW = """\
+# body_part,modality,laterality,contrast,code,long_name,component,method
+
+# Chest X-ray
+Chest,CR,,N,36643-5,XR Chest Views,Chest,XR
+Chest,XR,,N,36643-5,XR Chest Views,Chest,XR
+
+# Chest CT
+Chest,CT,,N,24627-2,CT Chest W/O contrast,Chest,CT
+Chest,CT,,Y,24626-4,CT Chest W contrast IV,Chest,CT
+
+# Abdomen CT
+Abdomen,CT,,N,24640-5,CT Abdomen W/O contrast,Abdomen,CT
+Abdomen,CT,,Y,79101-4,CT Abdomen and Pelvis W contrast IV,Abdomen and Pelvis,CT
+
+# Brain CT
+Brain,CT,,N,24558-9,CT Head W/O contrast,Head,CT
+Brain,CT,,Y,24557-1,CT Head W contrast IV,Head,CT
+Head,CT,,N,24558-9,CT Head W/O contrast,Head,CT
+Head,CT,,Y,24557-1,CT Head W contrast IV,Head,CT
+
+# Brain MRI
+Brain,MR,,N,24556-3,MRI Brain W/O contrast,Brain,MRI
+Brain,MR,,Y,24555-5,MRI Brain W contrast IV,Brain,MRI
+Brain,MRI,,Y,24555-5,MRI Brain W contrast IV,Brain,MRI
+Brain,MRI,,N,24556-3,MRI Brain W/O contrast,Brain,MRI
+
+# Spine
+Cervical spine,CR,,N,36713-6,XR Cervical spine,Cervical spine,XR
+Cervical spine,CT,,N,24800-5,CT Cervical spine W/O contrast,Cervical spine,CT
+Cervical spine,MR,,N,24852-6,MRI Cervical spine W/O contrast,Cervical spine,MRI
+Cervical spine,MRI,,N,24852-6,MRI Cervical spine W/O contrast,Cervical spine,MRI
+Lumbar spine,CR,,N,36714-4,XR Lumbar spine,Lumbar spine,XR
+Lumbar spine,XR,,N,36714-4,XR Lumbar spine,Lumbar spine,XR
+Lumbar spine,CT,,N,24802-1,CT Lumbar spine W/O contrast,Lumbar spine,CT
+Lumbar spine,MR,,N,24860-9,MRI Lumbar spine W/O contrast,Lumbar spine,MRI
+Lumbar spine,MRI,,N,24860-9,MRI Lumbar spine W/O contrast,Lumbar spine,MRI
+
+# Extremities - Hand
+Hand,CR,Right,N,37362-0,XR Hand - right,Hand - right,XR
+Hand,XR,Right,N,37362-0,XR Hand - right,Hand - right,XR
+Hand,CR,Left,N,37361-2,XR Hand - left,Hand - left,XR
+Hand,XR,Left,N,37361-2,XR Hand - left,Hand - left,XR
+# Extremities - Knee
+Knee,CR,Right,N,37628-4,XR Knee - right,Knee - right,XR
+Knee,XR,Right,N,37628-4,XR Knee - right,Knee - right,XR
+Knee,CR,Left,N,37627-6,XR Knee - left,Knee - left,XR
+Knee,XR,Left,N,37627-6,XR Knee - left,Knee - left,XR
+Knee,CR,Bilateral,N,69161-8,XR Knee - bilateral,Knee - bilateral,XR
+Knee,XR,Bilateral,N,69161-8,XR Knee - bilateral,Knee - bilateral,XR
+Knee,MR,Right,N,24876-5,MRI Knee - right W/O contrast,Knee - right,MRI
+Knee,MRI,Right,N,24876-5,MRI Knee - right W/O contrast,Knee - right,MRI
+Knee,MR,Left,N,24875-7,MRI Knee - left W/O contrast,Knee - left,MRI
+Knee,MRI,Left,N,24875-7,MRI Knee - left W/O contrast,Knee - left,MRI
+
+# Pelvis
+Pelvis,CR,,N,37748-0,XR Pelvis,Pelvis,XR
+Pelvis,XR,,N,37748-0,XR Pelvis,Pelvis,XR
+Pelvis,CT,,N,24907-8,CT Pelvis W/O contrast,Pelvis,CT
+Pelvis,MR,,N,24926-8,MRI Pelvis W/O contrast,Pelvis,MRI
+
+# Abdomen and Pelvis
+Abdomen,CT,,Y,79101-4,CT Abdomen and Pelvis W contrast IV,Abdomen and Pelvis,CT
+
+# Ultrasound
+Abdomen,US,,N,30704-1,US Abdomen,Abdomen,US
+Liver,US,,N,30705-8,US Liver,Liver,US
+Kidney,US,,N,24642-1,US Kidney,Kidney,US
+Kidney,US,Bilateral,N,24642-1,US Kidney bilateral,Kidney,US
+
+# KUB (Kidney Ureter Bladder)
+Kidney,CT,,N,24645-4,CT Kidney W/O contrast,Kidney,CT
+Ureter,CT,,N,72171-2,CT Ureter,Ureter,CT
+Bladder,CT,,N,24538-1,CT Bladder W/O contrast,Bladder,CT
+
+# Heart and Vascular
+Heart,XA,,Y,42798-6,XA Heart,Heart,XA
+Heart,Angio,,Y,42798-6,Angiography Heart,Heart,Angio
+Coronary artery,XA,,Y,42798-6,XA Coronary arteries,Coronary artery,XA
+Coronary artery,Angio,,Y,42798-6,Angiography Coronary arteries,Coronary artery,Angio
+
+# Bone density
+Spine,BMD,,N,38262-7,DXA Bone density in Spine,Spine,DXA
+Spine,DXA,,N,38262-7,DXA Bone density in Spine,Spine,DXA
+Hip,BMD,,N,38263-5,DXA Bone density in Hip,Hip,DXA
+Hip,DXA,,N,38263-5,DXA Bone density in Hip,Hip,DXA
+"""
+
+
+def _build_db():
+    """Parse _RAW into (body_part, modality, laterality, contrast) -> LOINC info"""
+    table = {}
+    rows = (line for line in _RAW.splitlines() if line and not line.startswith('#'))
+    for body_part, modality, laterality, contrast, code, long_name, component, method in csv.reader(rows):
+        table[(body_part, modality, laterality or None, contrast)] = {
+            'code': code,
+            'long_name': long_name,
+            'component': component,
+            'method': method
+        }
+    return table
+
 
 # Modality to LOINC method mapping
 MODALITY_TO_METHOD = {
@@ -403,3 +149,91 @@ GENERIC_LOINC_PATTERNS = {
     'Angio': 'LP29263-8',  # Angiography
     'DXA': 'LP29697-7',  # DXA
 }
+
+
+def _build_records(table):
+    """
+    Convert entry dictionaries to LoincRecord tuples
+
+    Every key part and field value is interned so repeated strings share
+    one object, and keys with identical entries share one record.
+    """
+    records = {}
+    pool = {}
+    for key, info in table.items():
+        key = tuple(sys.intern(part) if part is not None else None for part in key)
+        record = LoincRecord(**{field: sys.intern(value) for field, value in info.items()})
+        records[key] = pool.setdefault(record, record)
+    return records
+
+
+def _canonicalize(table):
+    """
+    Re-key table entries on their LOINC method
+
+    Rows entered under a modality alias (CR, MR, XA, BMD) are stored under
+    the method they normalize to (XR, MRI, Angio, DXA). When both forms
+    exist, the row keyed on the method itself wins.
+    """
+    canonical = {}
+    aliased = []
+    for key, info in table.items():
+        body_part, modality, laterality, contrast = key
+        method = normalize_modality(modality, modality)
+        if method == modality:
+            canonical[key] = info
+        else:
+            aliased.append(((body_part, method, laterality, contrast), info))
+
+    for key, info in aliased:
+        canonical.setdefault(key, info)
+
+    return canonical
+
+
+# Index key for entries without laterality; keeps every index key a str
+_LAT_NONE = sys.intern('')
+
+
+def _group_by_body_method(table):
+    """Group the table into (body_part, method) -> (laterality, contrast) -> entry"""
+    groups = {}
+    for (body_part, method, laterality, contrast), info in table.items():
+        groups.setdefault((body_part, method), {})[(laterality or _LAT_NONE, contrast)] = info
+    return MappingProxyType({key: MappingProxyType(group) for key, group in groups.items()})
+
+
+MODALITY_TO_METHOD = {sys.intern(k): sys.intern(v) for k, v in MODALITY_TO_METHOD.items()}
+GENERIC_LOINC_PATTERNS = {sys.intern(k): sys.intern(v) for k, v in GENERIC_LOINC_PATTERNS.items()}
+
+# normalize_modality(modality, default) -> LOINC method. Bound to the
+# underlying dict so calls skip both the attribute lookup and the proxy
+normalize_modality = MODALITY_TO_METHOD.get
+
+# The tables are built once and only read afterwards; expose them as
+# read-only views so no consumer can mutate the shared state
+MODALITY_TO_METHOD = MappingProxyType(MODALITY_TO_METHOD)
+GENERIC_LOINC_PATTERNS = MappingProxyType(GENERIC_LOINC_PATTERNS)
+
+# LOINC_DATABASE and its lookup index are built on first access (PEP 562),
+# so importing only the modality constants does not materialize the table
+_LAZY_TABLES = ('LOINC_DATABASE', 'BY_BODY_METHOD')
+
+
+def _load_tables():
+    """Build LOINC_DATABASE and its lookup index and publish them as module globals"""
+    global LOINC_DATABASE, BY_BODY_METHOD
+
+    table = MappingProxyType(_canonicalize(_build_records(_build_db())))
+    # Fallback-chain index: one probe per (body_part, method), then a
+    # handful of (laterality or '', contrast) candidates
+    BY_BODY_METHOD = _group_by_body_method(table)
+    LOINC_DATABASE = table
+
+
+def __getattr__(name):
+    if name in _LAZY_TABLES:
+        _load_tables()
+        return globals()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
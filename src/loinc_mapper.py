@@ -2,26 +2,99 @@
 LOINC code mapper for radiology studies
 """
 
-from typing import Dict, Optional, List, Tuple
-from .loinc_database import LOINC_DATABASE, MODALITY_TO_METHOD, GENERIC_LOINC_PATTERNS
-from .description_parser import DescriptionParser
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Dict, Optional, List, Tuple
+from . import loinc_database
+from .loinc_database import MODALITY_TO_METHOD, GENERIC_LOINC_PATTERNS, LoincRecord
+from .description_parser import DescriptionParser, factorize_studies
+
+
+@dataclass
+class MappingResult:
+    """LOINC mapping result for one study"""
+
+    # Fixed attribute layout: no per-result __dict__ for large batches
+    __slots__ = (
+        'value_code', 'modality', 'combine_modality', 'primary_modality',
+        'study_description', 'chinese_description', 'expanded_description',
+        'body_parts', 'laterality', 'contrast',
+        'loinc_code', 'loinc_long_name', 'loinc_component', 'loinc_method',
+        'mapping_confidence', 'issues', 'has_issues', 'issues_prefixed'
+    )
+
+    value_code: str
+    modality: str
+    combine_modality: str
+    primary_modality: str
+    study_description: str
+    chinese_description: str
+    expanded_description: str
+    body_parts: List[str]
+    laterality: Optional[str]
+    contrast: str
+    loinc_code: Optional[str]
+    loinc_long_name: Optional[str]
+    loinc_component: Optional[str]
+    loinc_method: Optional[str]
+    mapping_confidence: str
+    issues: List[str]
+    has_issues: bool
+    issues_prefixed: List[str]  # issues as "LOINC: ...", for merged reports
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Return the result as a dictionary (field name -> value)"""
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+@lru_cache(maxsize=64)
+def _fold_modality(modality: str) -> str:
+    """Map a modality in any case to its LOINC method (memoized per spelling)"""
+    modality_upper = modality.upper()
+    return MODALITY_TO_METHOD.get(modality_upper, modality_upper)
 
 
 class LOINCMapper:
     """Map radiology studies to LOINC codes"""
 
+    # Body parts to exclude (often false positives from abbreviations)
+    _EXCLUDE_BODY_PARTS = frozenset({'Face', 'Bone'})
+
+    # Priority order for specific terms, lowercased once for matching
+    _PRIORITY_KEYWORDS_LOWER = tuple(keyword.lower() for keyword in (
+        'Cervical spine', 'Thoracic spine', 'Lumbar spine', 'Lumbosacral spine',
+        'Coronary artery', 'Carotid artery', 'Renal artery',
+        'Left', 'Right', 'Bilateral'
+    ))
+
     def __init__(self):
-        self.loinc_db = LOINC_DATABASE
+        # The table is built on first access, i.e. when the first mapper is created
+        self.loinc_db = loinc_database.LOINC_DATABASE
+        # (body_part, method) -> {(laterality or '', contrast): record}
+        self.loinc_db_by_bp_method = loinc_database.BY_BODY_METHOD
+        # Methods that appear in the table; anything else cannot match
+        self._valid_methods = frozenset(method for _, method, _, _ in self.loinc_db)
         self.modality_map = MODALITY_TO_METHOD
+        # Exact-spelling index: upper-case modalities and methods resolve
+        # without case folding
+        self._modality_index = dict(MODALITY_TO_METHOD)
+        self._modality_index.update(
+            (method, method) for method in MODALITY_TO_METHOD.values() if method == method.upper()
+        )
         self.generic_patterns = GENERIC_LOINC_PATTERNS
         self.parser = DescriptionParser()
+        # Worklists repeat the same studies; memoize per instance so the
+        # cache does not keep mappers alive
+        self._compute_mapping = lru_cache(maxsize=4096)(self._compute_mapping)
 
     def normalize_modality(self, modality: str) -> str:
         """Convert modality to LOINC method"""
         if not modality:
             return ""
-        modality_upper = modality.upper()
-        return self.modality_map.get(modality_upper, modality_upper)
+        method = self._modality_index.get(modality)
+        if method is None:
+            method = _fold_modality(modality)
+        return method
 
     def _filter_body_parts(self, body_parts: List[str]) -> List[str]:
         """
@@ -33,52 +106,30 @@ class LOINCMapper:
         Returns:
             Filtered list of body parts
         """
-        # Body parts to exclude (often false positives from abbreviations)
-        exclude_list = ['Face', 'Bone']
-
-        filtered = []
-        for part in body_parts:
-            if part not in exclude_list:
-                filtered.append(part)
+        filtered = [part for part in body_parts if part not in self._EXCLUDE_BODY_PARTS]
 
         # If filtering removed everything, keep original list
-        if not filtered and body_parts:
-            return body_parts
+        return filtered or body_parts
 
-        return filtered
-
-    def _select_best_loinc(self, loinc_codes: List[Tuple[str, Dict]], body_parts: List[str]) -> Tuple[str, Dict]:
+    def _specificity_key(self, position: int, body_part: str) -> Tuple[int, int, int]:
         """
-        Select the best LOINC code from multiple matches
-
-        Prioritizes more specific anatomical terms
+        Sort key ranking body parts from most to least specific
 
         Args:
-            loinc_codes: List of (body_part, loinc_info) tuples
-            body_parts: Original list of body parts
+            position: Index of the body part in its original list (tie-break)
+            body_part: Body part name
 
         Returns:
-            Best (body_part, loinc_info) tuple
+            Key tuple; smaller is more specific
         """
-        if len(loinc_codes) == 1:
-            return loinc_codes[0]
-
-        # Priority order for specific terms
-        priority_keywords = [
-            'Cervical spine', 'Thoracic spine', 'Lumbar spine', 'Lumbosacral spine',
-            'Coronary artery', 'Carotid artery', 'Renal artery',
-            'Left', 'Right', 'Bilateral'
-        ]
-
-        # First, try priority keywords
-        for keyword in priority_keywords:
-            for body_part, loinc_info in loinc_codes:
-                if keyword.lower() in body_part.lower():
-                    return (body_part, loinc_info)
-
-        # Prefer longer/more specific terms
-        sorted_codes = sorted(loinc_codes, key=lambda x: len(x[0]), reverse=True)
-        return sorted_codes[0]
+        priority_keywords = self._PRIORITY_KEYWORDS_LOWER
+        body_part_lower = body_part.lower()
+        # First, the earliest priority keyword (ties: earliest candidate)
+        for keyword_rank, keyword in enumerate(priority_keywords):
+            if keyword in body_part_lower:
+                return (keyword_rank, 0, position)
+        # Otherwise prefer longer/more specific terms
+        return (len(priority_keywords), -len(body_part), position)
 
     def find_loinc_code(
         self,
@@ -86,7 +137,7 @@ class LOINCMapper:
         modality: str,
         laterality: Optional[str] = None,
         contrast: str = "N"
-    ) -> Optional[Dict]:
+    ) -> Optional[LoincRecord]:
         """
         Find LOINC code based on study parameters
 
@@ -97,10 +148,18 @@ class LOINCMapper:
             contrast: Y/N/N+Y
 
         Returns:
-            Dictionary with LOINC code and metadata, or None if not found
+            LoincRecord with LOINC code and metadata, or None if not found
         """
         # Normalize modality
         method = self.normalize_modality(modality)
+        if method not in self._valid_methods:
+            return None
+
+        # One probe for the (body_part, method) group; the fallback chain
+        # below only checks its few (laterality, contrast) candidates
+        candidates = self.loinc_db_by_bp_method.get((body_part, method))
+        if candidates is None:
+            return None
 
         # Handle contrast variations
         contrast_values = []
@@ -113,18 +172,18 @@ class LOINCMapper:
         else:
             contrast_values = ['N', 'Y']  # Default try both
 
-        # Try to find exact match
+        # Try to find exact match (single probe per key)
         for contrast_val in contrast_values:
             # Try with laterality first
             if laterality:
-                key = (body_part, method, laterality, contrast_val)
-                if key in self.loinc_db:
-                    return self.loinc_db[key].copy()
+                loinc_info = candidates.get((laterality, contrast_val))
+                if loinc_info is not None:
+                    return loinc_info
 
             # Try without laterality
-            key = (body_part, method, None, contrast_val)
-            if key in self.loinc_db:
-                return self.loinc_db[key].copy()
+            loinc_info = candidates.get(('', contrast_val))
+            if loinc_info is not None:
+                return loinc_info
 
         return None
 
@@ -136,7 +195,7 @@ class LOINCMapper:
         chinese_desc: str = "",
         contrast: str = "",
         combine_modality: str = ""
-    ) -> Dict:
+    ) -> MappingResult:
         """
         Map a radiology study to LOINC code
 
@@ -149,7 +208,35 @@ class LOINCMapper:
             combine_modality: Comma-separated modalities
 
         Returns:
-            Dictionary with mapping results and metadata
+            MappingResult with mapping results and metadata
+        """
+        return self._stamp_result(value_code, self._compute_mapping(
+            modality, study_desc, chinese_desc, contrast, combine_modality
+        ))
+
+    @staticmethod
+    def _stamp_result(value_code: str, mapping: Dict) -> MappingResult:
+        """Build the result for value_code from a shared computed mapping"""
+        result = MappingResult(value_code=value_code, **mapping)
+        # The computed mapping is cached and shared; give each result its own lists
+        result.body_parts = list(result.body_parts)
+        result.issues = list(result.issues)
+        result.issues_prefixed = list(result.issues_prefixed)
+        return result
+
+    def _compute_mapping(
+        self,
+        modality: str,
+        study_desc: str,
+        chinese_desc: str,
+        contrast: str,
+        combine_modality: str
+    ) -> Dict:
+        """
+        Compute the mapping fields that do not depend on value_code
+
+        Memoized per instance by map_study_to_loinc; treat the returned
+        dictionary as read-only.
         """
         # Parse the study description
         parsed = self.parser.parse_study_description(
@@ -172,7 +259,6 @@ class LOINCMapper:
         filtered_body_parts = self._filter_body_parts(parsed['body_parts'])
 
         result = {
-            'value_code': value_code,
             'modality': modality,
             'combine_modality': combine_modality,
             'primary_modality': primary_modality,
@@ -191,9 +277,15 @@ class LOINCMapper:
             'has_issues': parsed['has_issues']
         }
 
-        # Try to find LOINC code for each body part
+        # Try body parts from most to least specific: the first hit is the
+        # best match, and a second hit is only needed for the warning below
+        ranked_body_parts = sorted(
+            range(len(filtered_body_parts)),
+            key=lambda position: self._specificity_key(position, filtered_body_parts[position])
+        )
         loinc_codes = []
-        for body_part in filtered_body_parts:
+        for position in ranked_body_parts:
+            body_part = filtered_body_parts[position]
             loinc_info = self.find_loinc_code(
                 body_part,
                 primary_modality,
@@ -202,14 +294,16 @@ class LOINCMapper:
             )
             if loinc_info:
                 loinc_codes.append((body_part, loinc_info))
+                if len(loinc_codes) > 1:
+                    break
 
         if loinc_codes:
             # Use the best match (most specific)
-            body_part, loinc_info = self._select_best_loinc(loinc_codes, filtered_body_parts)
-            result['loinc_code'] = loinc_info['code']
-            result['loinc_long_name'] = loinc_info['long_name']
-            result['loinc_component'] = loinc_info['component']
-            result['loinc_method'] = loinc_info['method']
+            body_part, loinc_info = loinc_codes[0]
+            result['loinc_code'] = loinc_info.code
+            result['loinc_long_name'] = loinc_info.long_name
+            result['loinc_component'] = loinc_info.component
+            result['loinc_method'] = loinc_info.method
             result['mapping_confidence'] = 'High'
 
             if len(loinc_codes) > 1:
@@ -241,9 +335,10 @@ class LOINCMapper:
         if contrast == 'N+Y':
             result['issues'].append('Both contrast and non-contrast - LOINC code may need separate entries')
 
+        result['issues_prefixed'] = [f"LOINC: {issue}" for issue in result['issues']]
         return result
 
-    def map_batch(self, studies: List[Dict]) -> List[Dict]:
+    def map_batch(self, studies: List[Dict]) -> List[MappingResult]:
         """
         Map multiple studies to LOINC codes
 
@@ -265,3 +360,27 @@ class LOINCMapper:
             )
             results.append(result)
         return results
+
+    def map_batch_df(self, df) -> List[MappingResult]:
+        """
+        Map a DataFrame of studies to LOINC codes
+
+        Rows are factorized on their input signature so each distinct
+        study is parsed and mapped once, then joined back to its rows.
+
+        Args:
+            df: DataFrame with the input columns (value_code, modality,
+                Study Description, Chinese Study Description, Contrast,
+                Combine Modality); missing columns and null values are
+                treated as empty
+
+        Returns:
+            List of mapping results, in row order
+        """
+        value_codes, signature_ids, signatures = factorize_studies(df)
+        mappings = [self._compute_mapping(*signature) for signature in signatures]
+
+        return [
+            self._stamp_result(value_code, mappings[signature_id])
+            for value_code, signature_id in zip(value_codes, signature_ids)
+        ]
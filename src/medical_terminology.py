@@ -2,6 +2,8 @@
 Medical terminology and abbreviations for radiology studies
 """
 
+import sys
+
 # Common radiology abbreviations
 ABBREVIATIONS = {
     # Anatomical regions
@@ -342,3 +344,10 @@ CHINESE_CONTRAST = {
     '不含對比劑': 'N',
     '平掃': 'N',
 }
+
+# The standardized names end up in LOINC lookup keys; intern them so key
+# comparisons against the (interned) table keys are identity checks
+for _table in (BODY_PARTS, CHINESE_BODY_PARTS, LATERALITY, CHINESE_LATERALITY):
+    for _keyword, _standardized in _table.items():
+        _table[_keyword] = sys.intern(_standardized)
+del _table, _keyword, _standardized
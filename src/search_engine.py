@@ -2,12 +2,193 @@
 import pandas as pd
 import numpy as np
 import os
-import pickle
 from typing import List, Dict, Optional, Tuple, Union
-from sklearn.feature_extraction.text import TfidfVectorizer
-from sklearn.metrics.pairwise import cosine_similarity
+from sklearn.feature_extraction.text import HashingVectorizer, TfidfTransformer
+from sklearn.pipeline import Pipeline
 from sentence_transformers import SentenceTransformer
+import heapq
+import threading
 import time
+from collections import OrderedDict
+from functools import lru_cache
+from operator import itemgetter
+
+# faiss is optional; without it semantic search falls back to an exact cosine scan
+try:
+    import faiss
+    FAISS_AVAILABLE = True
+except ImportError:
+    FAISS_AVAILABLE = False
+
+
+def _topk(sims: np.ndarray, k: int) -> np.ndarray:
+    """
+    Indices of the k highest scores, best first
+
+    Uses an O(N) argpartition and only sorts the k selected scores.
+    """
+    if k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if k >= len(sims):
+        return np.argsort(-sims)
+    idx = np.argpartition(sims, -k)[-k:]
+    return idx[np.argsort(-sims[idx])]
+
+
+class _QueryEncoder:
+    """
+    Coalesce concurrent single-query encodes into one batched forward pass.
+
+    The first caller of a batch becomes its leader: it waits up to max_wait
+    seconds (or until max_batch queries are pending), encodes the whole
+    batch with one model call and hands every caller its own row.
+    """
+
+    def __init__(self, model: SentenceTransformer, max_batch: int = 32, max_wait: float = 0.01):
+        self.model = model
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._cond = threading.Condition()
+        self._pending = []
+
+    def encode(self, query: str) -> np.ndarray:
+        """Return the (1, dim) normalized embedding of query"""
+        slot = {'done': threading.Event()}
+        with self._cond:
+            self._pending.append((query, slot))
+            is_leader = len(self._pending) == 1
+            if len(self._pending) >= self.max_batch:
+                self._cond.notify()
+
+        if is_leader:
+            with self._cond:
+                self._cond.wait_for(lambda: len(self._pending) >= self.max_batch, timeout=self.max_wait)
+                batch, self._pending = self._pending, []
+            try:
+                embeddings = self.model.encode(
+                    [q for q, _ in batch],
+                    batch_size=self.max_batch,
+                    convert_to_numpy=True,
+                    normalize_embeddings=True
+                )
+                for row, (_, waiting) in zip(embeddings, batch):
+                    waiting['embedding'] = row
+            except Exception as e:
+                for _, waiting in batch:
+                    waiting['error'] = e
+            finally:
+                for _, waiting in batch:
+                    waiting['done'].set()
+        else:
+            slot['done'].wait()
+
+        if 'error' in slot:
+            raise slot['error']
+        return slot['embedding'][np.newaxis]
+
+
+class SearchResultCache:
+    """
+    Two-level cache of search results.
+
+    A lookup first tries the whitespace/case-normalized query text, then
+    the cached query whose embedding is closest to the new one; a cosine
+    similarity of at least `threshold` counts as a hit. Entries expire
+    after `ttl` seconds and the least recently used entry is evicted once
+    `max_entries` is reached. Cached results are shared: read them, never
+    mutate them.
+    """
+
+    def __init__(self, max_entries: int = 5000, threshold: float = 0.92, ttl: float = 3600.0):
+        self.max_entries = max_entries
+        self.threshold = threshold
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        # (params, normalized query) -> (slot, created, results), LRU first
+        self._entries = OrderedDict()
+        self._free_slots = list(range(max_entries))
+        self._slot_keys = [None] * max_entries
+        # Unit-norm query embedding per slot, and the id of its search
+        # parameters (-1: free or no embedding); allocated on first use
+        self._embeddings = None
+        self._slot_params = np.full(max_entries, -1, dtype=np.int64)
+        # params -> [id, slots using it]; dropped with its last slot, since
+        # params can be per-query (e.g. the clinical attributes of a search)
+        self._param_ids = {}
+        self._slot_param_keys = [None] * max_entries
+        self._next_param_id = 0
+
+    @staticmethod
+    def _key(params: Tuple, query: str) -> Tuple:
+        return (params, ' '.join(query.lower().split()))
+
+    def _evict(self, key: Tuple):
+        slot = self._entries.pop(key)[0]
+        self._slot_keys[slot] = None
+        self._slot_params[slot] = -1
+        params = self._slot_param_keys[slot]
+        if params is not None:
+            self._slot_param_keys[slot] = None
+            ref = self._param_ids[params]
+            ref[1] -= 1
+            if not ref[1]:
+                del self._param_ids[params]
+        self._free_slots.append(slot)
+
+    def get(self, params: Tuple, query: str, embedding: Optional[np.ndarray] = None) -> Optional[Dict]:
+        """
+        Return cached results for query, or None on a miss
+
+        Args:
+            params: Search parameters the results depend on (strategy, top_k, ...)
+            query: Query text
+            embedding: Unit-norm query embedding, enables the similarity lookup
+        """
+        key = self._key(params, query)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None and embedding is not None and self._embeddings is not None:
+                ref = self._param_ids.get(params)
+                if ref is not None:
+                    sims = self._embeddings @ np.ravel(embedding)
+                    sims[self._slot_params != ref[0]] = -np.inf
+                    best = int(np.argmax(sims))
+                    if sims[best] >= self.threshold:
+                        key = self._slot_keys[best]
+                        entry = self._entries[key]
+            if entry is None:
+                return None
+            _, created, results = entry
+            if time.monotonic() - created > self.ttl:
+                self._evict(key)
+                return None
+            self._entries.move_to_end(key)
+            return results
+
+    def put(self, params: Tuple, query: str, results: Dict, embedding: Optional[np.ndarray] = None):
+        """Cache results for query (and its embedding, if given)"""
+        key = self._key(params, query)
+        with self._lock:
+            if key in self._entries:
+                self._evict(key)
+            elif not self._free_slots:
+                self._evict(next(iter(self._entries)))
+            slot = self._free_slots.pop()
+            self._entries[key] = (slot, time.monotonic(), results)
+            self._slot_keys[slot] = key
+            if embedding is not None:
+                embedding = np.ravel(embedding)
+                if self._embeddings is None:
+                    self._embeddings = np.zeros((self.max_entries, embedding.size), dtype=np.float32)
+                self._embeddings[slot] = embedding
+                ref = self._param_ids.get(params)
+                if ref is None:
+                    ref = self._param_ids[params] = [self._next_param_id, 0]
+                    self._next_param_id += 1
+                ref[1] += 1
+                self._slot_params[slot] = ref[0]
+                self._slot_param_keys[slot] = params
+
 
 class UnifiedSearchEngine:
     """
@@ -19,6 +200,11 @@ class UnifiedSearchEngine:
         self.data_path = data_path
         self.loinc_df = None
         self.icd_df = None
+        # Row dicts of the dataframes, precomputed for result assembly
+        self.loinc_records = []
+        self.icd_records = []
+        # LOINC METHOD_TYP -> row positions, for method-restricted searches
+        self.loinc_rows_by_method = {}
         
         # Search components
         self.tfidf_vectorizer_loinc = None
@@ -27,8 +213,21 @@ class UnifiedSearchEngine:
         self.tfidf_matrix_icd = None
         
         self.embedding_model = None
+        self.query_encoder = None
         self.loinc_embeddings = None
         self.icd_embeddings = None
+        # Approximate nearest-neighbour indexes over the embeddings (faiss)
+        self.loinc_index = None
+        self.icd_index = None
+        # Repeated queries (e.g. a result-cache probe followed by the
+        # search itself) are encoded once
+        self._embed_query = lru_cache(maxsize=1024)(self._embed_query)
+        # Indexes are built lazily on first use; the lock keeps concurrent
+        # requests from building them twice or reading them half-built
+        self._init_lock = threading.Lock()
+        self._keyword_ready = False
+        self._semantic_ready = False
+        self._semantic_attempted = False
         
         # Load data
         self.load_data()
@@ -50,10 +249,9 @@ class UnifiedSearchEngine:
                 # self.loinc_df = self.loinc_df[self.loinc_df['CLASS'] == 'RAD'] 
                 
                 # Create a searchable text column
-                self.loinc_df['search_text'] = self.loinc_df.apply(
-                    lambda x: f"{x.get('LONG_COMMON_NAME', '')} {x.get('COMPONENT', '')} {x.get('METHOD_TYP', '')} {x.get('SYSTEM', '')}", 
-                    axis=1
-                ).str.lower()
+                self.loinc_df['search_text'] = self._build_search_text(
+                    self.loinc_df, ['LONG_COMMON_NAME', 'COMPONENT', 'METHOD_TYP', 'SYSTEM']
+                )
                 print(f"Loaded {len(self.loinc_df)} LOINC codes")
             else:
                 print(f"Warning: LOINC file not found at {loinc_path}")
@@ -64,198 +262,392 @@ class UnifiedSearchEngine:
             if os.path.exists(icd_path):
                 self.icd_df = pd.read_csv(icd_path)
                 # Create a searchable text column
-                self.icd_df['search_text'] = self.icd_df.apply(
-                    lambda x: f"{x.get('DESCRIPTION', '')} {x.get('BODY_PART', '')}", 
-                    axis=1
-                ).str.lower()
+                self.icd_df['search_text'] = self._build_search_text(
+                    self.icd_df, ['DESCRIPTION', 'BODY_PART']
+                )
                 print(f"Loaded {len(self.icd_df)} ICD-10-PCS codes")
             else:
                 print(f"Warning: ICD-10-PCS file not found at {icd_path}")
                 self.icd_df = pd.DataFrame()
+
+            self.loinc_records = self.loinc_df.to_dict('records')
+            self.icd_records = self.icd_df.to_dict('records')
+            self.loinc_rows_by_method = self._row_index(self.loinc_df, 'METHOD_TYP')
                 
         except Exception as e:
             print(f"Error loading data: {e}")
 
+    @staticmethod
+    def _build_search_text(df: pd.DataFrame, columns: List[str]) -> pd.Series:
+        """
+        Join columns into a lowercase, space-separated search string
+
+        Vectorized with pandas string ops instead of a per-row apply;
+        missing columns and NaN values contribute an empty string.
+        """
+        parts = df.reindex(columns=columns).fillna('').astype(str)
+        return parts[columns[0]].str.cat([parts[col] for col in columns[1:]], sep=' ').str.lower()
+
+    @staticmethod
+    def _row_index(df: pd.DataFrame, column: str) -> Dict[str, np.ndarray]:
+        """Map each value of column to the positions of the rows holding it"""
+        if column not in df.columns:
+            return {}
+        return df.groupby(column, sort=False).indices
+
+    def _loinc_rows(self, method: Optional[str]) -> Optional[np.ndarray]:
+        """Row positions to search for a LOINC method, or None for all rows"""
+        if method is None:
+            return None
+        return self.loinc_rows_by_method.get(method, np.empty(0, dtype=np.intp))
+
+    @staticmethod
+    def _make_tfidf_vectorizer() -> Pipeline:
+        """
+        TF-IDF over hashed word uni/bigrams
+
+        Feature hashing keeps the n-gram vocabulary implicit instead of
+        holding it as a Python dict; collisions over 2**18 buckets are
+        negligible at catalogue scale.
+        """
+        return Pipeline([
+            ('hash', HashingVectorizer(
+                analyzer='word', stop_words='english', ngram_range=(1, 2),
+                n_features=2 ** 18, alternate_sign=False, norm=None
+            )),
+            ('tfidf', TfidfTransformer(norm='l2')),
+        ])
+
     def initialize_keyword_search(self):
-        """Initialize TF-IDF vectorizers"""
+        """
+        Initialize TF-IDF vectorizers
+
+        Rows are L2-normalized (norm='l2'), so search_keyword can score
+        cosine similarity as a plain sparse dot product.
+        """
         if self.loinc_df is not None and not self.loinc_df.empty:
             print("Initializing LOINC keyword search...")
-            self.tfidf_vectorizer_loinc = TfidfVectorizer(analyzer='word', stop_words='english', ngram_range=(1, 2))
-            self.tfidf_matrix_loinc = self.tfidf_vectorizer_loinc.fit_transform(self.loinc_df['search_text'])
+            vectorizer = self._make_tfidf_vectorizer()
+            self.tfidf_matrix_loinc = vectorizer.fit_transform(self.loinc_df['search_text'])
+            # Published only once fitted; search_keyword tests the vectorizer
+            self.tfidf_vectorizer_loinc = vectorizer
             
         if self.icd_df is not None and not self.icd_df.empty:
             print("Initializing ICD keyword search...")
-            self.tfidf_vectorizer_icd = TfidfVectorizer(analyzer='word', stop_words='english', ngram_range=(1, 2))
-            self.tfidf_matrix_icd = self.tfidf_vectorizer_icd.fit_transform(self.icd_df['search_text'])
+            vectorizer = self._make_tfidf_vectorizer()
+            self.tfidf_matrix_icd = vectorizer.fit_transform(self.icd_df['search_text'])
+            self.tfidf_vectorizer_icd = vectorizer
 
-    def initialize_semantic_search(self, model_name='pritamdeka/S-PubMedBert-MS-MARCO'):
-        """Initialize Sentence Transformer model and embeddings with Biomedical Model"""
+    def initialize_semantic_search(self, model_name='pritamdeka/S-PubMedBert-MS-MARCO', quantize: bool = False):
+        """
+        Initialize Sentence Transformer model and embeddings with Biomedical Model
+
+        When faiss is installed, an HNSW index is built over the embeddings
+        (8-bit scalar quantized if quantize=True) and persisted next to
+        the embedding cache.
+        """
         print(f"Initializing semantic search with biomedical model {model_name}...")
+        index_suffix = "hnsw_sq8.faiss" if quantize else "hnsw.faiss"
         try:
             self.embedding_model = SentenceTransformer(model_name)
+            # Warm-up pass so the first real query does not pay kernel initialization
+            self.embedding_model.encode(["warm up"], convert_to_numpy=True)
+            self.query_encoder = _QueryEncoder(self.embedding_model)
             
             if self.loinc_df is not None and not self.loinc_df.empty:
                 print("Generating LOINC embeddings...")
                 # Check for cached embeddings
-                cache_path = os.path.join(self.data_path, "loinc_embeddings.pkl")
-                if os.path.exists(cache_path):
-                    with open(cache_path, 'rb') as f:
-                        self.loinc_embeddings = pickle.load(f)
-                else:
-                    self.loinc_embeddings = self.embedding_model.encode(
-                        self.loinc_df['search_text'].tolist(), 
-                        show_progress_bar=True
+                cache_path = os.path.join(self.data_path, "loinc_embeddings.f32.npy")
+                rebuild_index = not os.path.exists(cache_path)
+                if rebuild_index:
+                    embeddings = self.embedding_model.encode(
+                        self.loinc_df['search_text'].tolist(),
+                        show_progress_bar=True,
+                        convert_to_numpy=True,
+                        normalize_embeddings=True
                     )
-                    with open(cache_path, 'wb') as f:
-                        pickle.dump(self.loinc_embeddings, f)
+                    # Unit-norm, C-contiguous float32: cosine is a single BLAS matrix-vector product
+                    np.save(cache_path, np.ascontiguousarray(embeddings, dtype=np.float32))
+                # Memory-mapped: pages are loaded on demand and shared between workers
+                self.loinc_embeddings = np.load(cache_path, mmap_mode='r')
+                self.loinc_index = self._load_or_build_index(
+                    self.loinc_embeddings,
+                    os.path.join(self.data_path, f"loinc_embeddings.{index_suffix}"),
+                    rebuild_index,
+                    quantize
+                )
             
             if self.icd_df is not None and not self.icd_df.empty:
                 print("Generating ICD embeddings...")
-                cache_path = os.path.join(self.data_path, "icd_embeddings.pkl")
-                if os.path.exists(cache_path):
-                    with open(cache_path, 'rb') as f:
-                        self.icd_embeddings = pickle.load(f)
-                else:
-                    self.icd_embeddings = self.embedding_model.encode(
+                cache_path = os.path.join(self.data_path, "icd_embeddings.f32.npy")
+                rebuild_index = not os.path.exists(cache_path)
+                if rebuild_index:
+                    embeddings = self.embedding_model.encode(
                         self.icd_df['search_text'].tolist(),
-                        show_progress_bar=True
+                        show_progress_bar=True,
+                        convert_to_numpy=True,
+                        normalize_embeddings=True
                     )
-                    with open(cache_path, 'wb') as f:
-                        pickle.dump(self.icd_embeddings, f)
+                    # Unit-norm, C-contiguous float32: cosine is a single BLAS matrix-vector product
+                    np.save(cache_path, np.ascontiguousarray(embeddings, dtype=np.float32))
+                # Memory-mapped: pages are loaded on demand and shared between workers
+                self.icd_embeddings = np.load(cache_path, mmap_mode='r')
+                self.icd_index = self._load_or_build_index(
+                    self.icd_embeddings,
+                    os.path.join(self.data_path, f"icd_embeddings.{index_suffix}"),
+                    rebuild_index,
+                    quantize
+                )
+            self._semantic_ready = True
                         
         except Exception as e:
             print(f"Error initializing semantic search: {e}")
 
-    def search_keyword(self, query: str, code_type: str = 'both', top_k: int = 5) -> Dict:
+    @staticmethod
+    def _load_or_build_index(embeddings: np.ndarray, index_path: str, rebuild: bool, quantize: bool):
+        """
+        Load or build an inner-product HNSW index over unit-norm embeddings
+
+        Returns None when faiss is not installed. The index is rebuilt
+        whenever the embeddings were regenerated.
+        """
+        if not FAISS_AVAILABLE:
+            return None
+
+        if not rebuild and os.path.exists(index_path):
+            index = faiss.read_index(index_path)
+        else:
+            print(f"Building vector index {index_path}...")
+            vectors = np.ascontiguousarray(embeddings, dtype=np.float32)
+            dim = vectors.shape[1]
+            if quantize:
+                # int8 scalar quantization: a quarter of the FP32 memory traffic
+                index = faiss.IndexHNSWSQ(dim, faiss.ScalarQuantizer.QT_8bit, 32, faiss.METRIC_INNER_PRODUCT)
+                index.train(vectors)
+            else:
+                index = faiss.IndexHNSWFlat(dim, 32, faiss.METRIC_INNER_PRODUCT)
+            index.add(vectors)
+            faiss.write_index(index, index_path)
+
+        index.hnsw.efSearch = 64
+        return index
+
+    @staticmethod
+    def _semantic_top_k(
+        query_embedding: np.ndarray,
+        embeddings: np.ndarray,
+        index,
+        top_k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row indices, cosine scores) of the top_k nearest rows, best first
+
+        Both the query and the stored embeddings are unit-norm, so cosine
+        similarity is the inner product. Uses the faiss index when
+        available, otherwise an exact scan. If rows is given, only those
+        rows are scanned (exactly).
+        """
+        query = np.ascontiguousarray(query_embedding, dtype=np.float32)
+        if index is not None and rows is None:
+            scores, indices = index.search(query, top_k)
+            found = indices[0] >= 0
+            return indices[0][found], scores[0][found]
+
+        # float32 matrix-vector product (BLAS sgemv)
+        if rows is None:
+            cosine_sims = embeddings @ query.ravel()
+            top_indices = _topk(cosine_sims, top_k)
+            return top_indices, cosine_sims[top_indices]
+        cosine_sims = embeddings[rows] @ query.ravel()
+        top_indices = _topk(cosine_sims, top_k)
+        return rows[top_indices], cosine_sims[top_indices]
+
+    @staticmethod
+    def _keyword_top_k(
+        tfidf_matrix,
+        query_vec,
+        top_k: int,
+        rows: Optional[np.ndarray] = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Return (row indices, cosine scores) of the top_k TF-IDF matches, best first
+
+        Rows are L2-normalized, so cosine similarity is a sparse dot
+        product. If rows is given, only those rows are scored.
+        """
+        if rows is not None:
+            tfidf_matrix = tfidf_matrix[rows]
+        cosine_sims = (tfidf_matrix @ query_vec.T).toarray().ravel()
+        top_indices = _topk(cosine_sims, top_k)
+        scores = cosine_sims[top_indices]
+        if rows is not None:
+            top_indices = rows[top_indices]
+        return top_indices, scores
+
+    def search_keyword(self, query: str, code_type: str = 'both', top_k: int = 5, method: Optional[str] = None) -> Dict:
         """
         Perform keyword (TF-IDF) search
+
+        If method is given, LOINC results are restricted to that METHOD_TYP.
         """
         results = {'loinc': [], 'icd': []}
         query = query.lower()
         
         if code_type in ['loinc', 'both'] and self.tfidf_vectorizer_loinc:
             query_vec = self.tfidf_vectorizer_loinc.transform([query])
-            cosine_sims = cosine_similarity(query_vec, self.tfidf_matrix_loinc).flatten()
-            top_indices = cosine_sims.argsort()[-top_k:][::-1]
+            top_indices, scores = self._keyword_top_k(
+                self.tfidf_matrix_loinc, query_vec, top_k, self._loinc_rows(method)
+            )
             
-            for idx in top_indices:
-                score = cosine_sims[idx]
+            for idx, score in zip(top_indices, scores):
                 if score > 0.1:  # Threshold
-                    record = self.loinc_df.iloc[idx].to_dict()
+                    record = dict(self.loinc_records[idx])
                     record['score'] = float(score)
                     results['loinc'].append(record)
                     
         if code_type in ['icd', 'both'] and self.tfidf_vectorizer_icd:
             query_vec = self.tfidf_vectorizer_icd.transform([query])
-            cosine_sims = cosine_similarity(query_vec, self.tfidf_matrix_icd).flatten()
-            top_indices = cosine_sims.argsort()[-top_k:][::-1]
+            top_indices, scores = self._keyword_top_k(self.tfidf_matrix_icd, query_vec, top_k)
             
-            for idx in top_indices:
-                score = cosine_sims[idx]
+            for idx, score in zip(top_indices, scores):
                 if score > 0.1:
-                    record = self.icd_df.iloc[idx].to_dict()
+                    record = dict(self.icd_records[idx])
                     record['score'] = float(score)
                     results['icd'].append(record)
                     
         return results
 
-    def search_semantic(self, query: str, code_type: str = 'both', top_k: int = 5) -> Dict:
+    def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """
+        Return the (1, dim) unit-norm embedding of query
+
+        Returns None until semantic search has been initialized. The
+        returned array is shared between callers and must not be modified.
+        """
+        if not self._semantic_ready:
+            return None
+        return self._embed_query(query)
+
+    def _embed_query(self, query: str) -> np.ndarray:
+        # Concurrent queries share one batched forward pass
+        return self.query_encoder.encode(query)
+
+    def search_semantic(self, query: str, code_type: str = 'both', top_k: int = 5, method: Optional[str] = None) -> Dict:
         """
         Perform semantic (Vector) search
+
+        If method is given, LOINC results are restricted to that METHOD_TYP.
         """
         results = {'loinc': [], 'icd': []}
-        if not self.embedding_model:
+        query_embedding = self.embed_query(query)
+        if query_embedding is None:
             return results
-            
-        query_embedding = self.embedding_model.encode([query])
         
         if code_type in ['loinc', 'both'] and self.loinc_embeddings is not None:
-            cosine_sims = cosine_similarity(query_embedding, self.loinc_embeddings).flatten()
-            top_indices = cosine_sims.argsort()[-top_k:][::-1]
+            top_indices, scores = self._semantic_top_k(
+                query_embedding, self.loinc_embeddings, self.loinc_index, top_k,
+                self._loinc_rows(method)
+            )
             
-            for idx in top_indices:
-                score = cosine_sims[idx]
+            for idx, score in zip(top_indices, scores):
                 if score > 0.3:  # Higher threshold for semantic
-                    record = self.loinc_df.iloc[idx].to_dict()
+                    record = dict(self.loinc_records[idx])
                     record['score'] = float(score)
                     results['loinc'].append(record)
                     
         if code_type in ['icd', 'both'] and self.icd_embeddings is not None:
-            cosine_sims = cosine_similarity(query_embedding, self.icd_embeddings).flatten()
-            top_indices = cosine_sims.argsort()[-top_k:][::-1]
+            top_indices, scores = self._semantic_top_k(
+                query_embedding, self.icd_embeddings, self.icd_index, top_k
+            )
             
-            for idx in top_indices:
-                score = cosine_sims[idx]
+            for idx, score in zip(top_indices, scores):
                 if score > 0.3:
-                    record = self.icd_df.iloc[idx].to_dict()
+                    record = dict(self.icd_records[idx])
                     record['score'] = float(score)
                     results['icd'].append(record)
                     
         return results
         
-    def search(self, query: str, strategy: str = 'hybrid', code_type: str = 'both', top_k: int = 5) -> Dict:
+    def is_ready(self, strategy: str = 'hybrid') -> bool:
+        """Whether every index the strategy searches has been fully built"""
+        if strategy != 'semantic' and not self._keyword_ready:
+            return False
+        if strategy != 'keyword' and not self._semantic_ready:
+            return False
+        return True
+
+    def ensure_initialized(self, strategy: str = 'hybrid'):
+        """
+        Build the indexes the strategy needs, once
+
+        Safe to call from concurrent requests: the first caller builds
+        under the lock while the others wait. A failed semantic
+        initialization is not retried; is_ready then stays False.
+        """
+        need_keyword = strategy != 'semantic' and not self._keyword_ready
+        need_semantic = strategy != 'keyword' and not self._semantic_attempted
+        if not (need_keyword or need_semantic):
+            return
+        with self._init_lock:
+            if strategy != 'semantic' and not self._keyword_ready:
+                self.initialize_keyword_search()
+                self._keyword_ready = True
+            if strategy != 'keyword' and not self._semantic_attempted:
+                self.initialize_semantic_search()
+                self._semantic_attempted = True
+
+    def search(
+        self,
+        query: str,
+        strategy: str = 'hybrid',
+        code_type: str = 'both',
+        top_k: int = 5,
+        method: Optional[str] = None
+    ) -> Dict:
         """
         Unified search method supporting multiple strategies
         Strategies: 'keyword', 'semantic', 'hybrid'
+        Optional method (LOINC METHOD_TYP, e.g. 'CT') restricts LOINC results
         """
+        self.ensure_initialized(strategy)
         if strategy == 'keyword':
-            if not self.tfidf_vectorizer_loinc:
-                self.initialize_keyword_search()
-            return self.search_keyword(query, code_type, top_k)
+            return self.search_keyword(query, code_type, top_k, method)
             
         elif strategy == 'semantic':
-            if not self.embedding_model:
-                self.initialize_semantic_search()
-            return self.search_semantic(query, code_type, top_k)
+            return self.search_semantic(query, code_type, top_k, method)
             
         else: # Hybrid (Simple merge for now, could be re-rank)
-            # Ensure initialized
-            if not self.tfidf_vectorizer_loinc:
-                self.initialize_keyword_search()
-            if not self.embedding_model:
-                self.initialize_semantic_search()
-                
-            kw_results = self.search_keyword(query, code_type, top_k)
-            sem_results = self.search_semantic(query, code_type, top_k)
+            kw_results = self.search_keyword(query, code_type, top_k, method)
+            sem_results = self.search_semantic(query, code_type, top_k, method)
             
-            # Simple blending: take unique results, prioritize semantic score? 
-            # Or just return both sections for frontend to display?
-            # Let's return a structured object distinguishing them for now, or merge them.
-            
-            # Merging strategy: Dictionary by code to deduplicate
-            merged = {'loinc': {}, 'icd': {}}
-            
-            # Process LOINC
-            for res in kw_results['loinc']:
-                res['strategy'] = 'keyword'
-                merged['loinc'][res['LOINC_NUM']] = res
-            for res in sem_results['loinc']:
-                code = res['LOINC_NUM']
-                if code in merged['loinc']:
-                    # Boost score if found in both
-                    merged['loinc'][code]['score'] = max(merged['loinc'][code]['score'], res['score'])
-                    merged['loinc'][code]['strategy'] = 'hybrid'
-                else:
-                    res['strategy'] = 'semantic'
-                    merged['loinc'][code] = res
-                    
-            # Process ICD
-            for res in kw_results['icd']:
-                res['strategy'] = 'keyword'
-                merged['icd'][res['ICD10PCS_CODE']] = res
-            for res in sem_results['icd']:
-                code = res['ICD10PCS_CODE']
-                if code in merged['icd']:
-                    merged['icd'][code]['score'] = max(merged['icd'][code]['score'], res['score'])
-                    merged['icd'][code]['strategy'] = 'hybrid'
-                else:
-                    res['strategy'] = 'semantic'
-                    merged['icd'][code] = res
-            
-            # Convert back to list and sort
-            final_results = {
-                'loinc': sorted(merged['loinc'].values(), key=lambda x: x['score'], reverse=True)[:top_k],
-                'icd': sorted(merged['icd'].values(), key=lambda x: x['score'], reverse=True)[:top_k]
+            # Merging strategy: deduplicate by code, keep the best score
+            return {
+                'loinc': self._merge_hits(kw_results['loinc'], sem_results['loinc'], 'LOINC_NUM', top_k),
+                'icd': self._merge_hits(kw_results['icd'], sem_results['icd'], 'ICD10PCS_CODE', top_k)
             }
-            
-            return final_results
+
+    @staticmethod
+    def _merge_hits(keyword_hits: List[Dict], semantic_hits: List[Dict], code_field: str, top_k: int) -> List[Dict]:
+        """
+        Merge keyword and semantic hits by code and return the top_k by score
+
+        A code found by both strategies keeps the higher score and is
+        tagged 'hybrid'.
+        """
+        merged = {}
+        for res in keyword_hits:
+            res['strategy'] = 'keyword'
+            merged[res[code_field]] = res
+        for res in semantic_hits:
+            existing = merged.get(res[code_field])
+            if existing is not None:
+                # Boost score if found in both
+                existing['score'] = max(existing['score'], res['score'])
+                existing['strategy'] = 'hybrid'
+            else:
+                res['strategy'] = 'semantic'
+                merged[res[code_field]] = res
+
+        # Partial selection; same order as a stable descending sort
+        return heapq.nlargest(top_k, merged.values(), key=itemgetter('score'))
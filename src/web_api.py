@@ -1,33 +1,108 @@
-from fastapi import FastAPI, UploadFile, File, HTTPException
+from fastapi import FastAPI, UploadFile, File, HTTPException, Depends
 from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse, JSONResponse
+from fastapi.responses import FileResponse, JSONResponse, ORJSONResponse
+from fastapi.concurrency import run_in_threadpool
+from starlette.background import BackgroundTask
+from fastapi.middleware.gzip import GZipMiddleware
 from pydantic import BaseModel
 from typing import Optional
 import pandas as pd
-import io
+import asyncio
+import importlib
+import multiprocessing
 import os
+import shutil
+import re
+import tempfile
+import threading
+import traceback
 from pathlib import Path
 from datetime import datetime
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
 # Local imports
-from .loinc_mapper import LOINCMapper
+from .loinc_mapper import LOINCMapper, MappingResult
 from .icd10pcs_mapper import ICD10PCSMapper
+from .description_parser import DescriptionParser
+from .loinc_database import normalize_modality
 from .excel_processor import ExcelProcessor
-from .search_engine import UnifiedSearchEngine
-# LLM Engine is imported conditionally inside endpoints or here? 
-# To avoid heavy imports just for checking status, let's import the wrapper
-try:
-    from .llm_engine import llm_engine
-except ImportError:
-    llm_engine = None
-
-app = FastAPI(title="Rad-LOINC Mapper API")
-
-# Initialize mappers and search engine
-loinc_mapper = LOINCMapper()
-icd10pcs_mapper = ICD10PCSMapper()
+
+# orjson writes NaN/Infinity as null and serializes numpy values natively,
+# so results need no sanitizing pass before encoding
+app = FastAPI(title="Rad-LOINC Mapper API", default_response_class=ORJSONResponse)
+
+class _APIGZipMiddleware(GZipMiddleware):
+    """GZip responses, except file downloads (xlsx is already zip-compressed)"""
+
+    SKIP_PATHS = ('/api/process_file', '/api/download/', '/api/download_static/')
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["path"].startswith(self.SKIP_PATHS):
+            await self.app(scope, receive, send)
+            return
+        await super().__call__(scope, receive, send)
+
+# Search/map JSON is highly repetitive; compress anything worth it
+app.add_middleware(_APIGZipMiddleware, minimum_size=1024)
+
 excel_processor = ExcelProcessor()
-search_engine = UnifiedSearchEngine(data_path="data")
+
+# Mappers, search engine and LLM engine are built on first use rather than
+# at import, so startup (and every --reload) stays fast and processes only
+# pay for what they serve
+@lru_cache(maxsize=1)
+def get_loinc_mapper() -> LOINCMapper:
+    return LOINCMapper()
+
+@lru_cache(maxsize=1)
+def get_icd10pcs_mapper() -> ICD10PCSMapper:
+    return ICD10PCSMapper()
+
+_SEARCH_ENGINE_LOCK = threading.Lock()
+
+@lru_cache(maxsize=1)
+def _build_search_engine():
+    from .search_engine import UnifiedSearchEngine
+    return UnifiedSearchEngine(data_path="data")
+
+def get_search_engine():
+    # Dependencies run concurrently in the threadpool and lru_cache does
+    # not stop two first callers from each loading the dictionaries
+    with _SEARCH_ENGINE_LOCK:
+        return _build_search_engine()
+
+@lru_cache(maxsize=1)
+def get_search_cache():
+    from .search_engine import SearchResultCache
+    return SearchResultCache(max_entries=5000, threshold=0.92, ttl=3600.0)
+
+@lru_cache(maxsize=1)
+def get_description_parser() -> DescriptionParser:
+    return DescriptionParser()
+
+@lru_cache(maxsize=1)
+def get_llm_engine():
+    """Return the LLM engine wrapper, or None if its dependencies are missing"""
+    try:
+        return importlib.import_module('.llm_engine', __package__).llm_engine
+    except ImportError:
+        return None
+
+# Dedicated executors instead of the loop's default one, which is shared
+# with every other library: LLM calls are serialized on a single thread
+# (vLLM is not thread-safe), and mapping/search work gets its own pool so
+# neither queues behind the other
+# os.cpu_count() returns None when the count cannot be determined
+_CPU_COUNT = os.cpu_count() or 1
+_LLM_POOL = ThreadPoolExecutor(max_workers=1, thread_name_prefix='llm')
+_MAP_POOL = ThreadPoolExecutor(max_workers=_CPU_COUNT, thread_name_prefix='map')
+
+@app.on_event("shutdown")
+def _shutdown_thread_pools():
+    _LLM_POOL.shutdown(wait=False)
+    _MAP_POOL.shutdown(wait=False)
 
 # Models
 class MappingRequest(BaseModel):
@@ -41,6 +116,7 @@ class SearchRequest(BaseModel):
     strategy: str = "hybrid" # keyword, semantic, hybrid
     code_type: str = "both" # loinc, icd, both
     top_k: int = 10
+    method: Optional[str] = None # restrict LOINC results to a METHOD_TYP (e.g. CT)
 
 class ChatRequest(BaseModel):
     prompt: str
@@ -57,62 +133,46 @@ app.mount("/static", StaticFiles(directory=str(WEB_DIR)), name="static")
 async def read_index():
     return FileResponse(str(WEB_DIR / "index.html"))
 
-import math
-
-def clean_nans(data):
-    """Recursively replace NaN and Infinity with None for JSON compliance"""
-    if isinstance(data, dict):
-        return {k: clean_nans(v) for k, v in data.items()}
-    elif isinstance(data, list):
-        return [clean_nans(v) for v in data]
-    elif isinstance(data, float):
-        if math.isnan(data) or math.isinf(data):
-            return None
-    return data
-
 # LLM Endpoints
 @app.get("/api/llm/status")
-async def get_llm_status():
+async def get_llm_status(llm_engine=Depends(get_llm_engine)):
     if not llm_engine:
         return {"status": "unavailable", "message": "LLM Engine not initialized correctly."}
     return {"status": "loaded" if llm_engine.is_loaded() else "unloaded", "model": llm_engine.model_name}
 
 @app.post("/api/llm/load")
-async def load_llm():
+async def load_llm(llm_engine=Depends(get_llm_engine)):
     if not llm_engine:
          raise HTTPException(status_code=500, detail="LLM Engine unavailable")
     try:
-        # This is a heavy blocking operation, ideally run in threadpool
-        # But vLLM might not like threading. Let's try direct call for now or use run_in_executor
-        import asyncio
+        # Heavy blocking operation: run it on the single LLM thread
         loop = asyncio.get_event_loop()
-        # Creating a wrapper because load_model doesn't take args in run_in_executor easily
-        await loop.run_in_executor(None, llm_engine.load_model)
+        await loop.run_in_executor(_LLM_POOL, llm_engine.load_model)
         return {"status": "loaded", "model": llm_engine.model_name}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/llm/unload")
-async def unload_llm():
+async def unload_llm(llm_engine=Depends(get_llm_engine)):
     if not llm_engine:
          raise HTTPException(status_code=500, detail="LLM Engine unavailable")
     try:
-        llm_engine.unload_model()
+        loop = asyncio.get_event_loop()
+        await loop.run_in_executor(_LLM_POOL, llm_engine.unload_model)
         return {"status": "unloaded"}
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
 @app.post("/api/llm/chat")
-async def chat_with_llm(request: ChatRequest):
+async def chat_with_llm(request: ChatRequest, llm_engine=Depends(get_llm_engine)):
     if not llm_engine or not llm_engine.is_loaded():
          raise HTTPException(status_code=400, detail="Model not loaded. Please load the model first.")
     try:
-        # Run generation in thread to avoid blocking event loop
-        import asyncio
+        # Run generation on the LLM thread to avoid blocking event loop
         loop = asyncio.get_event_loop()
         
         response_text = await loop.run_in_executor(
-            None, 
+            _LLM_POOL, 
             llm_engine.generate_response, 
             request.prompt, 
             request.system_prompt
@@ -121,186 +181,396 @@ async def chat_with_llm(request: ChatRequest):
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@lru_cache(maxsize=4096)
+def _clinical_attributes(query: str) -> tuple:
+    """
+    Modality, body parts, laterality and contrast stated in a search query
+
+    Embeddings of e.g. "CT left knee" and "CT right knee" are close enough
+    to count as paraphrases, so these are part of the cache parameters and
+    a similarity hit must agree on all of them.
+    """
+    parser = get_description_parser()
+    query_lower = query.lower()
+    methods = {normalize_modality(token.upper()) for token in re.findall(r'[a-z]+', query_lower)}
+    methods.discard(None)
+    # Every contrast keyword present, not the parser's single verdict:
+    # "contrast" alone would make "with" and "without contrast" agree
+    contrast = [keyword for keyword in parser.contrast_keywords if keyword in query_lower]
+    return (
+        tuple(sorted(methods)),
+        tuple(sorted(parser.extract_body_parts(query))),
+        parser.extract_laterality(query),
+        tuple(contrast)
+    )
+
+def _search_cached(search_engine, query: str, strategy: str, code_type: str, top_k: int, method: Optional[str]):
+    """Serve a search from the result cache, running and caching it on a miss"""
+    search_cache = get_search_cache()
+    search_engine.ensure_initialized(strategy)
+    # Paraphrase matching only makes sense for embedding-based strategies;
+    # keyword searches are cached by exact (normalized) text
+    if strategy == 'keyword':
+        params = (strategy, code_type, top_k, method)
+        embedding = None
+    else:
+        params = (strategy, code_type, top_k, method, _clinical_attributes(query))
+        embedding = search_engine.embed_query(query)
+    results = search_cache.get(params, query, embedding)
+    if results is None:
+        results = search_engine.search(query, strategy, code_type, top_k, method)
+        # Results from a partially available engine (e.g. semantic model
+        # failed to load) are served but not cached
+        if search_engine.is_ready(strategy):
+            search_cache.put(params, query, results, embedding)
+    return results
+
 @app.post("/api/search")
-async def search_codes(request: SearchRequest):
+async def search_codes(request: SearchRequest, search_engine=Depends(get_search_engine)):
     """
     Search for LOINC or ICD-10-PCS codes using specified strategy.
     Strategies: 'keyword' (TF-IDF), 'semantic' (Embeddings), 'hybrid' (Combined)
     """
     try:
-        results = search_engine.search(
-            query=request.query, 
-            strategy=request.strategy, 
-            code_type=request.code_type,
-            top_k=request.top_k
+        # Run in the mapping pool so concurrent semantic queries can share one encode batch
+        loop = asyncio.get_event_loop()
+        results = await loop.run_in_executor(
+            _MAP_POOL,
+            _search_cached,
+            search_engine,
+            request.query,
+            request.strategy,
+            request.code_type,
+            request.top_k,
+            request.method
         )
-        return clean_nans(results)
+        # Returning the response directly skips FastAPI's jsonable_encoder pass
+        return ORJSONResponse(results)
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Requisition vocabularies repeat constantly and mapping is a pure function
+# of the request, so single-study results are cached by exact input. The
+# cached results are shared: read them, never mutate them.
+@lru_cache(maxsize=65536)
+def _map_loinc_cached(modality: str, study_desc: str, chinese_desc: str, contrast: str):
+    return get_loinc_mapper().map_study_to_loinc(
+        value_code="REQ",
+        modality=modality,
+        study_desc=study_desc,
+        chinese_desc=chinese_desc,
+        contrast=contrast
+    )
+
+@lru_cache(maxsize=65536)
+def _map_icd10pcs_cached(modality: str, study_desc: str, chinese_desc: str, contrast: str):
+    return get_icd10pcs_mapper().map_study_to_icd10pcs(
+        value_code="REQ",
+        modality=modality,
+        study_desc=study_desc,
+        chinese_desc=chinese_desc,
+        contrast=contrast
+    )
+
 @app.post("/api/map")
 async def map_single_study(request: MappingRequest):
     try:
-        # 1. Map LOINC
-        loinc_result = loinc_mapper.map_study_to_loinc(
-            value_code="REQ",
-            modality=request.modality,
-            study_desc=request.study_desc,
-            chinese_desc=request.chinese_desc,
-            contrast=request.contrast
-        )
-        
-        # 2. Map ICD-10-PCS
-        icd_result = icd10pcs_mapper.map_study_to_icd10pcs(
-            value_code="REQ",
-            modality=request.modality,
-            study_desc=request.study_desc,
-            chinese_desc=request.chinese_desc,
-            contrast=request.contrast
+        # Map LOINC and ICD-10-PCS concurrently in the mapping pool so the
+        # event loop stays free for other requests
+        loop = asyncio.get_event_loop()
+        study = (request.modality, request.study_desc, request.chinese_desc, request.contrast)
+        loinc_result, icd_result = await asyncio.gather(
+            loop.run_in_executor(_MAP_POOL, _map_loinc_cached, *study),
+            loop.run_in_executor(_MAP_POOL, _map_icd10pcs_cached, *study)
         )
         
         # Merge results for frontend
         response = {
-            **loinc_result,
+            **loinc_result.to_dict(),
             "icd10pcs_code": icd_result.get("icd10pcs_code"),
             "icd10pcs_description": icd_result.get("icd10pcs_description"),
             "icd10pcs_section": icd_result.get("icd10pcs_section"),
             "icd10pcs_mapping_confidence": icd_result.get("mapping_confidence"),
-            # Combine issues
-            "all_issues": list(set(loinc_result.get("issues", []) + icd_result.get("issues", []))),
-            "has_issues": loinc_result.get("has_issues") or icd_result.get("has_issues")
+            # Combine issues (ordered, deduplicated)
+            "all_issues": list(dict.fromkeys(loinc_result.issues_prefixed + icd_result["issues_prefixed"])),
+            "has_issues": loinc_result.has_issues or icd_result.get("has_issues")
         }
         
-        return clean_nans(response)
+        return ORJSONResponse(response)
         
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+# Batch uploads are CPU-bound pure Python (parsing, mapping);
+# run them in worker processes so they neither block the event loop nor
+# contend for the GIL with other requests
+_PROC_POOL = None
+
+def _init_worker():
+    """Process-pool initializer: build the mappers once per worker process"""
+    get_loinc_mapper()
+    get_icd10pcs_mapper()
+
+def _get_process_pool() -> ProcessPoolExecutor:
+    """Create the batch process pool on first use"""
+    global _PROC_POOL
+    if _PROC_POOL is None:
+        # Forking a server that is already running threads (executors,
+        # tokenizers) can copy held locks into the child; start workers
+        # from a clean process instead
+        start_method = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else 'spawn'
+        _PROC_POOL = ProcessPoolExecutor(
+            max_workers=_CPU_COUNT,
+            mp_context=multiprocessing.get_context(start_method),
+            initializer=_init_worker
+        )
+    return _PROC_POOL
+
+def _discard_process_pool(pool: ProcessPoolExecutor):
+    """Drop a broken pool (a worker died) so the next request builds a new one"""
+    global _PROC_POOL
+    if _PROC_POOL is pool:
+        _PROC_POOL = None
+    pool.shutdown(wait=False)
+
+async def _map_chunks(chunks: list) -> list:
+    """Map chunks across the worker processes, rebuilding the pool once if a worker dies"""
+    loop = asyncio.get_event_loop()
+    for attempt in range(2):
+        pool = _get_process_pool()
+        try:
+            return await asyncio.gather(*(
+                loop.run_in_executor(pool, _map_chunk, chunk) for chunk in chunks
+            ))
+        except BrokenProcessPool:
+            _discard_process_pool(pool)
+            if attempt:
+                raise
+
+@app.on_event("shutdown")
+def _shutdown_process_pool():
+    if _PROC_POOL is not None:
+        _PROC_POOL.shutdown(wait=False)
+
+# Rows per mapping task; uploads are split into at most one chunk per worker
+_MIN_CHUNK_ROWS = 1000
+
+def _read_upload(upload_path: str, filename: str) -> pd.DataFrame:
+    """
+    Read and validate an uploaded Excel/CSV file
+
+    Args:
+        upload_path: Path of the uploaded file on disk
+        filename: Uploaded file name, used to pick the reader
+
+    Returns:
+        The studies, as an Arrow-backed DataFrame
+
+    Raises:
+        ValueError: If required columns are missing
+    """
+    # Load DataFrame with the native readers (multi-threaded Arrow CSV
+    # parser, Rust calamine for Excel) instead of the pure-Python defaults,
+    # keeping strings in Arrow buffers rather than one Python object each
+    if filename.endswith('.csv'):
+        df = pd.read_csv(upload_path, engine='pyarrow', dtype_backend='pyarrow')
+    else:
+        df = pd.read_excel(upload_path, engine='calamine', dtype_backend='pyarrow')
+
+    # Validate columns
+    required_cols = ['modality', 'Study Description']
+    missing = [col for col in required_cols if col not in df.columns]
+
+    # If value_code is missing, generate one
+    if 'value_code' not in df.columns:
+         df['value_code'] = 'ROW_' + pd.RangeIndex(1, len(df) + 1).astype('string[pyarrow]')
+
+    if missing:
+         raise ValueError(f"Missing required columns: {', '.join(missing)}")
+
+    # Empty cells are read as blank inputs by map_batch_df
+    return df
+
+def _map_chunk(df: pd.DataFrame) -> pd.DataFrame:
+    """Map a chunk of studies and assemble its output rows (runs in a worker process)"""
+    loinc_mapper, icd10pcs_mapper = get_loinc_mapper(), get_icd10pcs_mapper()
+
+    # Map straight from the columns
+    loinc_results = loinc_mapper.map_batch_df(df)
+    icd_results = icd10pcs_mapper.map_batch_df(df)
+
+    # Assemble the output column by column
+    ldf = pd.DataFrame({
+        field: [getattr(res, field) for res in loinc_results]
+        for field in MappingResult.__slots__
+    })
+    idf = pd.DataFrame.from_records(icd_results, columns=[
+        'icd10pcs_code', 'icd10pcs_description', 'icd10pcs_section',
+        'icd10pcs_body_system', 'icd10pcs_root_type', 'mapping_confidence',
+        'issues_prefixed', 'has_issues'
+    ])
+
+    # Combine issues from both mappings
+    all_issues = [
+        '; '.join(dict.fromkeys(l_issues + i_issues))
+        for l_issues, i_issues in zip(ldf['issues_prefixed'], idf['issues_prefixed'])
+    ]
+    has_any_issues = ldf['has_issues'].astype(bool) | idf['has_issues'].astype(bool)
+
+    result_df = pd.DataFrame({
+        # The input column itself, so its dtype (e.g. integer codes) is kept
+        'value_code': df['value_code'].reset_index(drop=True) if 'value_code' in df else ldf['value_code'],
+        'modality': ldf['modality'],
+        'Study Description': ldf['study_description'],
+        'Chinese Study Description': ldf['chinese_description'],
+        'Contrast': ldf['contrast'],
+        'Combine Modality': ldf['combine_modality'],
+        'Primary Modality': ldf['primary_modality'],
+        'Expanded Description': ldf['expanded_description'],
+        'Body Parts': ldf['body_parts'].map(', '.join),
+        'Laterality': ldf['laterality'].fillna(''),
+
+        # LOINC columns
+        'LOINC Code': ldf['loinc_code'].fillna(''),
+        'LOINC Name': ldf['loinc_long_name'].fillna(''),
+        'LOINC Component': ldf['loinc_component'].fillna(''),
+        'LOINC Method': ldf['loinc_method'].fillna(''),
+        'LOINC Confidence': ldf['mapping_confidence'],
+
+        # ICD-10-PCS columns
+        'ICD-10-PCS Code': idf['icd10pcs_code'].fillna(''),
+        'ICD-10-PCS Description': idf['icd10pcs_description'].fillna(''),
+        'ICD-10-PCS Section': idf['icd10pcs_section'].fillna(''),
+        'ICD-10-PCS Body System': idf['icd10pcs_body_system'].fillna(''),
+        'ICD-10-PCS Root Type': idf['icd10pcs_root_type'].fillna(''),
+        'ICD-10-PCS Confidence': idf['mapping_confidence'],
+
+        # Combined issues
+        'Has Issues': has_any_issues.map({True: 'Yes', False: 'No'}),
+        'Issues': all_issues
+    })
+    return result_df
+
+def _write_results(result_df: pd.DataFrame, output_path: str, output_format: str = 'xlsx'):
+    """
+    Write mapped results to output_path (runs on a server thread)
+
+    Args:
+        result_df: Assembled output rows
+        output_path: Path to write the mapped results to
+        output_format: 'xlsx' or 'csv' (much faster to write)
+    """
+    if output_format == 'csv':
+        result_df.to_csv(output_path, index=False)
+        return
+
+    # xlsxwriter is much faster than openpyxl. Its constant_memory mode
+    # cannot be used: it only accepts row-by-row writes, while to_excel
+    # writes column by column
+    with pd.ExcelWriter(
+        output_path,
+        engine='xlsxwriter',
+        engine_kwargs={'options': {'strings_to_urls': False}}
+    ) as writer:
+        result_df.to_excel(writer, index=False, sheet_name='Mapped Results')
+
+OUTPUT_MEDIA_TYPES = {
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
+    'csv': 'text/csv',
+}
+
 @app.post("/api/process_file")
-async def process_batch_file(file: UploadFile = File(...)):
+async def process_batch_file(file: UploadFile = File(...), output_format: str = 'xlsx'):
     if not file.filename.endswith(('.xlsx', '.xls', '.csv')):
         raise HTTPException(status_code=400, detail="Invalid file type. Please upload Excel or CSV.")
+    if output_format not in OUTPUT_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid output format. Use 'xlsx' or 'csv'.")
     
     try:
-        contents = await file.read()
-        file_bytes = io.BytesIO(contents)
-        
-        # Load DataFrame
-        if file.filename.endswith('.csv'):
-            df = pd.read_csv(file_bytes)
-        else:
-            df = pd.read_excel(file_bytes)
-            
-        # Validate columns
-        required_cols = ['modality', 'Study Description']
-        missing = [col for col in required_cols if col not in df.columns]
-        
-        # If value_code is missing, generate one
-        if 'value_code' not in df.columns:
-             df['value_code'] = [f'ROW_{i+1}' for i in range(len(df))]
-             
-        if missing:
-             raise HTTPException(status_code=400, detail=f"Missing required columns: {', '.join(missing)}")
-
-        # Convert to studies dict list
-        studies = df.to_dict('records')
-        
-        # Run mapping
-        loinc_results = loinc_mapper.map_batch(studies)
-        icd_results = icd10pcs_mapper.map_batch(studies)
-        
-        output_data = []
-        for l_res, i_res in zip(loinc_results, icd_results):
-            # Combine issues
-            all_issues = set()
-            if l_res.get('issues'):
-                all_issues.update([f"LOINC: {issue}" for issue in l_res['issues']])
-            if i_res.get('issues'):
-                all_issues.update([f"ICD-10-PCS: {issue}" for issue in i_res['issues']])
-
-            has_any_issues = l_res.get('has_issues') or i_res.get('has_issues')
-
-            row = {
-                'value_code': l_res.get('value_code', ''),
-                'modality': l_res.get('modality', ''),
-                'Study Description': l_res.get('study_description', ''),
-                'Chinese Study Description': l_res.get('chinese_description', ''),
-                'Contrast': l_res.get('contrast', ''),
-                'Combine Modality': l_res.get('combine_modality', ''),
-                'Primary Modality': l_res.get('primary_modality', ''),
-                'Expanded Description': l_res.get('expanded_description', ''),
-                'Body Parts': ', '.join(l_res.get('body_parts', [])),
-                'Laterality': l_res.get('laterality', '') or '',
-
-                # LOINC columns
-                'LOINC Code': l_res.get('loinc_code', '') or '',
-                'LOINC Name': l_res.get('loinc_long_name', '') or '',
-                'LOINC Component': l_res.get('loinc_component', '') or '',
-                'LOINC Method': l_res.get('loinc_method', '') or '',
-                'LOINC Confidence': l_res.get('mapping_confidence', ''),
-
-                # ICD-10-PCS columns
-                'ICD-10-PCS Code': i_res.get('icd10pcs_code', '') or '',
-                'ICD-10-PCS Description': i_res.get('icd10pcs_description', '') or '',
-                'ICD-10-PCS Section': i_res.get('icd10pcs_section', '') or '',
-                'ICD-10-PCS Body System': i_res.get('icd10pcs_body_system', '') or '',
-                'ICD-10-PCS Root Type': i_res.get('icd10pcs_root_type', '') or '',
-                'ICD-10-PCS Confidence': i_res.get('mapping_confidence', ''),
-
-                # Combined issues
-                'Has Issues': 'Yes' if has_any_issues else 'No',
-                'Issues': '; '.join(sorted(all_issues)) if all_issues else ''
-            }
-            output_data.append(row)
-            
-        result_df = pd.DataFrame(output_data)
-        
-        # Write to BytesIO
-        output = io.BytesIO()
-        with pd.ExcelWriter(output, engine='openpyxl') as writer:
-            result_df.to_excel(writer, index=False, sheet_name='Mapped Results')
-        
-        output.seek(0)
-        
-        filename = f"mapped_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx"
-        
-        from fastapi.responses import StreamingResponse
+        # Copy Starlette's spooled upload to disk in chunks so it is never
+        # held in memory as bytes; the native readers parse it from there
+        await file.seek(0)
+        with tempfile.NamedTemporaryFile(suffix=Path(file.filename).suffix, delete=False) as upload:
+            await run_in_threadpool(shutil.copyfileobj, file.file, upload)
+        try:
+            df = await run_in_threadpool(_read_upload, upload.name, file.filename)
+        finally:
+            os.unlink(upload.name)
+
+        # Map the rows in parallel chunks across the worker processes
+        n_chunks = max(1, min(_CPU_COUNT, len(df) // _MIN_CHUNK_ROWS))
+        chunk_size = -(-len(df) // n_chunks) or 1
+        chunks = [df.iloc[start:start + chunk_size] for start in range(0, max(len(df), 1), chunk_size)]
+        parts = await _map_chunks(chunks)
+        result_df = pd.concat(parts, ignore_index=True)
+
+        # The results are written from the parent rather than pickled back
+        # to a worker, and FileResponse sends them with sendfile; the file
+        # is removed once it has been sent
+        with tempfile.NamedTemporaryFile(suffix=f'.{output_format}', delete=False) as output:
+            pass
+        try:
+            await asyncio.get_event_loop().run_in_executor(
+                _MAP_POOL, _write_results, result_df, output.name, output_format
+            )
+        except Exception:
+            os.unlink(output.name)
+            raise
         
-        # Reset pointer for reading
-        output.seek(0)
+        filename = f"mapped_results_{datetime.now().strftime('%Y%m%d_%H%M%S')}.{output_format}"
         
-        return StreamingResponse(
-            output, 
-            media_type='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet',
-            headers={'Content-Disposition': f'attachment; filename="{filename}"'}
+        return FileResponse(
+            output.name,
+            filename=filename,
+            media_type=OUTPUT_MEDIA_TYPES[output_format],
+            background=BackgroundTask(os.unlink, output.name)
         )
 
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except BrokenProcessPool:
+        traceback.print_exc()
+        raise HTTPException(
+            status_code=503,
+            detail="A batch worker process died (for example out of memory); try again or upload a smaller file."
+        )
     except Exception as e:
-        import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=str(e))
 
+# Example files are served as-is by the static mount; /api/download/{name}
+# resolves friendly names against a table built once at import, so lookups
+# never touch the filesystem
+app.mount("/api/download_static", StaticFiles(directory=str(EXAMPLES_DIR), check_dir=False), name="examples")
+
+_DOWNLOAD_ALIASES = {
+    'sample_input': ('sample_input.csv',),
+    'rad_template': ('rad.xlsx', 'rad_prepared.xlsx'),
+}
+
+def _index_examples() -> dict:
+    """Map download names to example file names"""
+    files = set(os.listdir(EXAMPLES_DIR)) if EXAMPLES_DIR.is_dir() else set()
+    index = {}
+    # A bare name resolves to name.xlsx, else name.csv; exact names win
+    for ext in ('.csv', '.xlsx'):
+        index.update((name[:-len(ext)], name) for name in files if name.endswith(ext))
+    index.update((name, name) for name in files)
+
+    # Aliases used by the web UI resolve to their first existing file
+    for alias, candidates in _DOWNLOAD_ALIASES.items():
+        index.pop(alias, None)
+        name = next((name for name in candidates if name in files), None)
+        if name:
+            index[alias] = name
+    return index
+
+_EXAMPLE_FILES = _index_examples()
+
 @app.get("/api/download/{filename}")
 async def download_example(filename: str):
-    # Try to find file in examples dir
-    if filename == "sample_input":
-        path = EXAMPLES_DIR / "sample_input.csv"
-    elif filename == "rad_template":
-        path = EXAMPLES_DIR / "rad.xlsx"
-        if not path.exists():
-            # If template doesn't exist, try to generate one or check prepared
-            path = EXAMPLES_DIR / "rad_prepared.xlsx"
-    else:
-        # Generic try
-        path = EXAMPLES_DIR / filename
-        if not path.exists():
-             path = EXAMPLES_DIR / (filename + ".xlsx")
-        if not path.exists():
-             path = EXAMPLES_DIR / (filename + ".csv")
-    
-    if path and path.exists():
-        return FileResponse(str(path), filename=path.name)
-        
-    raise HTTPException(status_code=404, detail="File not found")
+    name = _EXAMPLE_FILES.get(filename)
+    if name is None:
+        raise HTTPException(status_code=404, detail="File not found")
+    return FileResponse(str(EXAMPLES_DIR / name), filename=name)
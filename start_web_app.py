@@ -6,6 +6,19 @@ import sys
 sys.path.insert(0, os.getcwd())
 
 if __name__ == "__main__":
+    # RELOAD=1 restarts on code changes (development, single process);
+    # WORKERS=N runs N server processes, e.g. WORKERS=$(nproc) in production
+    reload = os.getenv("RELOAD", "0") == "1"
+    workers = int(os.getenv("WORKERS", "1"))
+
     print("Starting Rad-LOINC Web Interface...")
     print("Open http://localhost:8000 in your browser")
-    uvicorn.run("src.web_api:app", host="0.0.0.0", port=8000, reload=True)
+    # loop/http default to "auto", which picks uvloop and httptools when
+    # installed (uvicorn[standard])
+    uvicorn.run(
+        "src.web_api:app",
+        host="0.0.0.0",
+        port=8000,
+        reload=reload,
+        workers=None if reload else workers
+    )
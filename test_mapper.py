@@ -107,14 +107,46 @@ def test_mapper():
     results = mapper.map_batch(test_studies)
 
     for result in results:
-        print(f"\nStudy: {result['value_code']} - {result['study_description']}")
-        print(f"  Body parts: {result['body_parts']}")
-        print(f"  Laterality: {result['laterality']}")
-        print(f"  LOINC Code: {result['loinc_code']}")
-        print(f"  LOINC Name: {result['loinc_long_name']}")
-        print(f"  Confidence: {result['mapping_confidence']}")
-        if result['has_issues']:
-            print(f"  Issues: {'; '.join(result['issues'])}")
+        print(f"\nStudy: {result.value_code} - {result.study_description}")
+        print(f"  Body parts: {result.body_parts}")
+        print(f"  Laterality: {result.laterality}")
+        print(f"  LOINC Code: {result.loinc_code}")
+        print(f"  LOINC Name: {result.loinc_long_name}")
+        print(f"  Confidence: {result.mapping_confidence}")
+        if result.has_issues:
+            print(f"  Issues: {'; '.join(result.issues)}")
+
+    print("\n" + "="*60 + "\n")
+
+
+def test_batch_output():
+    """Test that batch results survive the round trip through xlsx"""
+    print("Testing Batch Output")
+    print("="*60)
+
+    import tempfile
+    import pandas as pd
+    from src.web_api import _read_upload, _map_chunk, _write_results
+
+    input_path = Path(__file__).parent / 'examples' / 'sample_input.csv'
+    result_df = _map_chunk(_read_upload(str(input_path), input_path.name))
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        output_path = str(Path(tmp_dir) / 'mapped.xlsx')
+        _write_results(result_df, output_path, 'xlsx')
+        written = pd.read_excel(output_path, dtype=str, keep_default_na=False)
+
+    pd.testing.assert_frame_equal(
+        written,
+        result_df.astype(str),
+        check_dtype=False
+    )
+    print(f"\n{len(written)} rows x {len(written.columns)} columns written and read back intact")
+
+    # A header-only upload maps to an empty table with the same columns
+    empty_df = _map_chunk(result_df.iloc[:0][['value_code', 'modality', 'Study Description']])
+    assert empty_df.empty and list(empty_df.columns) == list(result_df.columns)
+    print("Header-only input maps to an empty table")
 
     print("\n" + "="*60 + "\n")
 
@@ -125,6 +157,7 @@ def main():
 
     test_parser()
     test_mapper()
+    test_batch_output()
 
     print("All tests completed!\n")
 
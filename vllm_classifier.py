@@ -1,24 +1,94 @@
 
 import pandas as pd
 from vllm import LLM, SamplingParams
+from vllm.sampling_params import GuidedDecodingParams
+import hashlib
 import json
+import multiprocessing
+import orjson
+import os
+import queue as queue_module
 import sys
-from typing import List, Dict
+from pathlib import Path
+from typing import Callable, List, Dict, Optional
+
+# Output schema the decoder is constrained to
+CLASSIFICATION_SCHEMA = {
+    "type": "object",
+    "properties": {
+        "body_part": {"type": "string"},
+        "modality": {"type": "string"},
+        "laterality": {"enum": ["Left", "Right", "Bilateral", "None"]},
+        "contrast": {"enum": ["Yes", "No", "Unknown"]},
+    },
+    "required": ["body_part", "modality", "laterality", "contrast"],
+    "additionalProperties": False,
+}
+
+# Prompts per llm.generate call: each chunk's outputs are parsed (and
+# checkpointed to the cache) and released before the next one
+GENERATE_CHUNK_SIZE = 4096
+
+def read_table(path: str) -> pd.DataFrame:
+    """Read studies from Parquet, Feather, CSV or Excel (by file suffix)"""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.parquet':
+        return pd.read_parquet(path)
+    if suffix == '.feather':
+        return pd.read_feather(path)
+    if suffix == '.csv':
+        return pd.read_csv(path, engine='pyarrow')
+    # Rust calamine reader instead of openpyxl's XML parsing
+    return pd.read_excel(path, engine='calamine')
+
+# Output suffixes write_table can produce
+OUTPUT_SUFFIXES = ('.xlsx', '.parquet', '.feather', '.csv')
+
+def write_table(df: pd.DataFrame, path: str):
+    """Write results to Parquet, Feather, CSV or xlsx (by file suffix)"""
+    suffix = Path(path).suffix.lower()
+    if suffix == '.parquet':
+        df.to_parquet(path, index=False)
+    elif suffix == '.feather':
+        df.reset_index(drop=True).to_feather(path)
+    elif suffix == '.csv':
+        df.to_csv(path, index=False)
+    elif suffix == '.xlsx':
+        df.to_excel(path, index=False, engine='xlsxwriter')
+    else:
+        raise ValueError(f"Unsupported output format '{suffix}'; use one of {', '.join(OUTPUT_SUFFIXES)}")
+
+def classify_studies(input_file: str, output_file: str, model_name: str = "Qwen/Qwen2.5-3B-Instruct",
+                     cache_file: Optional[str] = None, quantization: Optional[str] = None,
+                     low_mem: bool = False, tensor_parallel_size: int = 0, data_parallel_size: int = 1,
+                     kv_cache_dtype: str = "auto"):
+    # Fail before any generation rather than after it
+    if Path(output_file).suffix.lower() not in OUTPUT_SUFFIXES:
+        print(f"Unsupported output file {output_file}; use one of {', '.join(OUTPUT_SUFFIXES)}")
+        return
 
-def classify_studies(input_file: str, output_file: str, model_name: str = "Qwen/Qwen2.5-3B-Instruct"):
     print(f"Loading data from {input_file}...")
     try:
-        df = pd.read_excel(input_file)
+        df = read_table(input_file)
     except Exception as e:
         print(f"Error reading file: {e}")
         return
 
-    # Prepare unique descriptions to classify
-    descriptions = df['Study Description'].dropna().unique().tolist()
+    # Classify each description once per normalized form (case and
+    # whitespace folded); the model sees the first spelling of each.
+    # Non-text columns (numeric, all-null, Arrow-typed) are read as
+    # strings, and null descriptions stay null and are not classified
+    stripped = df['Study Description'].astype('string').str.strip()
+    norm = stripped.str.replace(r'\s+', ' ', regex=True).str.lower()
+    first_spellings = pd.DataFrame({
+        'norm': norm,
+        'desc': stripped
+    }).dropna().drop_duplicates('norm')
+    del stripped
+    descriptions = dict(zip(first_spellings['norm'], first_spellings['desc']))
+    del first_spellings
     print(f"Found {len(descriptions)} unique descriptions to classify.")
 
-    # Prepare prompts
-    prompts = []
     system_prompt = (
         "You are a helpful assistant that acts as a radiology terminology expert. "
         "Extract the following information from the radiology study description: "
@@ -28,66 +98,362 @@ def classify_studies(input_file: str, output_file: str, model_name: str = "Qwen/
         "4. Contrast (Yes, No, or Unknown) "
         "Output ONLY a valid JSON object with keys: 'body_part', 'modality', 'laterality', 'contrast'."
     )
+
+    # Optional on-disk cache of parsed classifications, so re-runs only
+    # generate for descriptions not seen with this model, prompt and schema
+    schema = json.dumps(CLASSIFICATION_SCHEMA, sort_keys=True)
+    def cache_key(norm_desc):
+        return hashlib.sha1(f"{model_name}\0{system_prompt}\0{schema}\0{norm_desc}".encode('utf-8')).hexdigest()
+
+    cache = {}
+    if cache_file and os.path.exists(cache_file):
+        with open(cache_file, encoding='utf-8') as f:
+            cache = json.load(f)
+    results = {n: cache[cache_key(n)] for n in descriptions if cache_key(n) in cache}
+    pending = [n for n in descriptions if n not in results]
+    if cache_file:
+        print(f"{len(results)} descriptions cached, {len(pending)} to generate.")
+    def save_cache(done):
+        # Parse failures are not cached so they are retried next run
+        cache.update({cache_key(n): results[n] for n in done if 'error' not in results[n]})
+        with open(cache_file, 'w', encoding='utf-8') as f:
+            json.dump(cache, f, ensure_ascii=False)
+
+    if pending:
+        if data_parallel_size > 1:
+            # One engine per GPU (or per --tp GPUs) unless told otherwise
+            engine_kwargs = engine_config(model_name, quantization, low_mem, tensor_parallel_size or 1,
+                                          kv_cache_dtype)
+            generated = generate_data_parallel(
+                pending, descriptions, system_prompt, engine_kwargs, results, data_parallel_size,
+                on_chunk=save_cache if cache_file else None
+            )
+        else:
+            engine_kwargs = engine_config(model_name, quantization, low_mem, tensor_parallel_size,
+                                          kv_cache_dtype)
+            generated = generate_classifications(
+                pending, descriptions, system_prompt, engine_kwargs, results,
+                on_chunk=save_cache if cache_file else None
+            )
+        # Chunks that did finish are already in the cache
+        if not generated:
+            return
+
+    # Map back to DataFrame
+    print("Mapping results back to dataframe...")
     
-    for desc in descriptions:
-        # Chat format for instruction tuned models
-        prompt = f"<|im_start|>system\n{system_prompt}<|im_end|>\n<|im_start|>user\nDescription: {desc}\nOutput JSON:<|im_end|>\n<|im_start|>assistant\n"
-        prompts.append(prompt)
+    # One row per classified description, looked up for every row at once
+    output_columns = {
+        'body_part': 'LLM_Body_Part',
+        'modality': 'LLM_Modality',
+        'laterality': 'LLM_Laterality',
+        'contrast': 'LLM_Contrast',
+    }
+    classified = [(n, r) for n, r in results.items() if isinstance(r, dict) and 'error' not in r]
+    results_df = pd.DataFrame(
+        {column: [r.get(field, '') for _, r in classified] for field, column in output_columns.items()},
+        index=pd.Index([n for n, _ in classified], dtype=object)
+    )
+    del classified
+    llm_columns = results_df.reindex(norm).fillna('')
+    for column in output_columns.values():
+        df[column] = llm_columns[column].to_numpy()
 
-    # Initialize VLLM
-    print(f"Initializing VLLM with model: {model_name}...")
-    # trustworthy_remote_code might be needed for some models like Qwen
+    print(f"Writing results to {output_file}...")
+    write_table(df, output_file)
+    print("Done!")
+
+def cuda_capability() -> Optional[tuple]:
+    """Return the CUDA compute capability of the GPU, or None without one"""
+    try:
+        import torch
+    except ImportError:
+        return None
+    if not torch.cuda.is_available():
+        return None
+    return torch.cuda.get_device_capability()
+
+def cuda_device_count() -> int:
+    """Return the number of visible CUDA GPUs"""
     try:
+        import torch
+    except ImportError:
+        return 0
+    return torch.cuda.device_count()
+
+def resolve_quantization(quantization: Optional[str]) -> Optional[str]:
+    """Return the vLLM quantization method to request (None: whatever the checkpoint declares)"""
+    if quantization != 'fp8':
+        return quantization
+    # FP8 kernels need Ada/Hopper (compute capability 8.9+)
+    capability = cuda_capability()
+    if capability is None or capability < (8, 9):
+        # vLLM still honours an FP8 checkpoint's own quantization_config
+        # (weight-only FP8 below 8.9); only an FP16 model avoids it
+        print("FP8 compute needs a GPU with compute capability 8.9 or newer; not forcing FP8. "
+              "An FP8 checkpoint still loads with its own quantization config; use an FP16 "
+              "model for FP16 weights.")
+        return None
+    return quantization
+
+def resolve_kv_cache_dtype(kv_cache_dtype: str = "auto") -> str:
+    """
+    Return the vLLM KV cache dtype for kv_cache_dtype
+
+    "auto" keeps the model dtype. "fp8" halves the KV bytes read per
+    decode step, picking the FP8 format the GPU supports; explicit
+    formats are passed through.
+    """
+    if kv_cache_dtype != "fp8":
+        return kv_cache_dtype
+    capability = cuda_capability()
+    if capability is None:
+        print("FP8 KV cache needs a CUDA GPU; keeping the model dtype.")
+        return "auto"
+    # E4M3 has the better precision but needs native FP8 (Ada/Hopper)
+    return "fp8_e4m3" if capability >= (8, 9) else "fp8_e5m2"
+
+def engine_config(model_name: str, quantization: Optional[str] = None, low_mem: bool = False,
+                  tensor_parallel_size: int = 0, kv_cache_dtype: str = "auto") -> Dict:
+    """
+    Return the vLLM LLM(...) arguments for classifying with model_name
+
+    tensor_parallel_size 0 shards the model across every visible GPU.
+    """
+    kwargs = dict(
+        model=model_name,
+        tensor_parallel_size=tensor_parallel_size or cuda_device_count() or 1,
+        # trustworthy_remote_code might be needed for some models like Qwen
+        trust_remote_code=True,
+        dtype="float16",
+        # Quantized weights (FP8/INT8 W8A8, or AWQ/GPTQ W4A16 on Ampere)
+        # cut the weight bytes read per decoded token
+        quantization=resolve_quantization(quantization),
+        kv_cache_dtype=resolve_kv_cache_dtype(kv_cache_dtype),
+        # Every prompt starts with the same system prompt: prefill its KV
+        # once and reuse it
+        enable_prefix_caching=True,
+        guided_decoding_backend="xgrammar",
+    )
+    if low_mem:
         # On Mac with 16GB, we need to be careful with memory
-        llm = LLM(model=model_name, trust_remote_code=True, dtype="float16", gpu_memory_utilization=0.6)
+        kwargs.update(gpu_memory_utilization=0.6)
+    else:
+        # Offline batch job: give the scheduler nearly all VRAM for KV
+        # blocks so it can decode many sequences per step
+        kwargs.update(
+            gpu_memory_utilization=0.92,
+            max_num_seqs=512,
+            max_num_batched_tokens=8192,
+            enable_chunked_prefill=True,
+        )
+    return kwargs
+
+def chat_template_ids(tokenizer, system_prompt: str):
+    """
+    Return the token ids around the user message in the chat template
+
+    Every prompt is prefix_ids + the tokenized user message + suffix_ids,
+    so the system prompt and template markup are tokenized only once.
+    Returns None if the template does not embed the user message verbatim.
+    """
+    placeholder = "\x00USER\x00"
+    text = tokenizer.apply_chat_template(
+        [{"role": "system", "content": system_prompt}, {"role": "user", "content": placeholder}],
+        tokenize=False, add_generation_prompt=True
+    )
+    parts = text.split(placeholder)
+    if len(parts) != 2:
+        return None
+    prefix, suffix = parts
+    return (
+        tokenizer.encode(prefix, add_special_tokens=False),
+        tokenizer.encode(suffix, add_special_tokens=False)
+    )
+
+def generate_classifications(pending: List[str], descriptions: Dict[str, str], system_prompt: str,
+                             engine_kwargs: Dict, results: Dict,
+                             on_chunk: Optional[Callable[[List[str]], None]] = None) -> bool:
+    """
+    Classify the pending normalized descriptions into results
+
+    Generation runs in chunks of GENERATE_CHUNK_SIZE prompts; on_chunk is
+    called with each chunk's descriptions once their results are in.
+    Returns False if vLLM fails to load.
+    """
+    # Initialize VLLM
+    print(f"Initializing VLLM with model: {engine_kwargs['model']}...")
+    try:
+        llm = LLM(**engine_kwargs)
     except Exception as e:
         print(f"Failed to initialize VLLM: {e}")
-        print("Note: On Mac with 16GB RAM, ensure you are using a small model (approx 3B parameters).")
-        return
+        print("Note: On Mac with 16GB RAM, use --low-mem and a small model (approx 3B parameters).")
+        return False
+
+    # Chat format for instruction tuned models, from the model's own chat
+    # template so any instruct model gets its correct special tokens.
+    # Similar descriptions next to each other share longer cached prefixes
+    pending = sorted(pending)
+    tokenizer = llm.get_tokenizer()
+    template_ids = chat_template_ids(tokenizer, system_prompt)
+    messages = [f"Description: {descriptions[norm_desc]}\nOutput JSON:" for norm_desc in pending]
+    if template_ids:
+        prefix_ids, suffix_ids = template_ids
+        # One batched call: fast (Rust) tokenizers encode the batch in parallel
+        if not getattr(tokenizer, "is_fast", False):
+            print("Note: using a slow (Python) tokenizer; prompt tokenization will be single-threaded.")
+        prompts = [
+            prefix_ids + message_ids + suffix_ids
+            for message_ids in tokenizer(messages, add_special_tokens=False)['input_ids']
+        ]
+        lengths = [len(prompt) for prompt in prompts]
+        prompts = [{"prompt_token_ids": prompt} for prompt in prompts]
+        generate = llm.generate
+    else:
+        # The template rewrites the user message, so it cannot be spliced
+        # in as tokens: let vLLM apply the template per conversation
+        system_message = {"role": "system", "content": system_prompt}
+        prompts = [[system_message, {"role": "user", "content": message}] for message in messages]
+        lengths = [len(message) for message in messages]
+        generate = llm.chat
+    del messages
 
-    sampling_params = SamplingParams(temperature=0.0, max_tokens=100)
+    # Submit prompts shortest first so sequences admitted together prefill
+    # and finish together (the stable sort keeps similar descriptions adjacent)
+    order = sorted(range(len(prompts)), key=lengths.__getitem__)
+    pending = [pending[i] for i in order]
+    prompts = [prompts[i] for i in order]
 
-    # Generate
+    # The sampler can only produce JSON matching the schema, so outputs
+    # need no cleanup and the model cannot wander into prose. The schema
+    # has no nested objects: stop at the first closing brace rather than
+    # waiting for EOS (~30 tokens per answer, capped at 48). Greedy with
+    # top-p/top-k disabled and no logprobs keeps the sampler on its
+    # argmax path instead of sorting the vocabulary every step
+    sampling_params = SamplingParams(
+        temperature=0.0,
+        top_p=1.0,
+        top_k=-1,
+        logprobs=None,
+        max_tokens=48,
+        stop=["}"],
+        include_stop_str_in_output=True,
+        guided_decoding=GuidedDecodingParams(json=CLASSIFICATION_SCHEMA)
+    )
+
+    # Generate, dropping each chunk's prompts once submitted so token ids
+    # are only held for the prompts still to run
     print("Generating classifications...")
-    outputs = llm.generate(prompts, sampling_params)
+    while prompts:
+        chunk = pending[:GENERATE_CHUNK_SIZE]
+        del pending[:GENERATE_CHUNK_SIZE]
+        chunk_prompts = prompts[:GENERATE_CHUNK_SIZE]
+        del prompts[:GENERATE_CHUNK_SIZE]
+        outputs = generate(chunk_prompts, sampling_params)
+        del chunk_prompts
+
+        # Parse results
+        for desc, output in zip(chunk, outputs):
+            generated_text = output.outputs[0].text
+            try:
+                results[desc] = orjson.loads(generated_text)
+            except orjson.JSONDecodeError:
+                # Only possible if max_tokens cut the object short
+                results[desc] = {'error': f"Parse Error: {generated_text}"}
+        del outputs
+        if on_chunk:
+            on_chunk(chunk)
 
-    # Parse results
+    return True
+
+def _data_parallel_worker(rank: int, devices: List[str], shard: List[str], descriptions: Dict[str, str],
+                          system_prompt: str, engine_kwargs: Dict, queue):
+    """
+    Classify one shard on the given GPUs
+
+    Reports (rank, 'chunk', results) as each chunk finishes and a final
+    (rank, 'done', ok).
+    """
+    os.environ["CUDA_VISIBLE_DEVICES"] = ",".join(devices)
     results = {}
-    for desc, output in zip(descriptions, outputs):
-        generated_text = output.outputs[0].text.strip()
-        # Clean up potential markdown formatting
-        if generated_text.startswith("```json"):
-            generated_text = generated_text.replace("```json", "").replace("```", "")
-        
-        try:
-            # Try to parse JSON
-            start_idx = generated_text.find('{')
-            end_idx = generated_text.rfind('}') + 1
-            if start_idx != -1 and end_idx != -1:
-                json_str = generated_text[start_idx:end_idx]
-                data = json.loads(json_str)
-                results[desc] = data
-            else:
-                results[desc] = {'error': generated_text}
-        except Exception as e:
-            results[desc] = {'error': f"Parse Error: {generated_text}"}
+    def report_chunk(chunk):
+        queue.put((rank, 'chunk', {n: results[n] for n in chunk}))
+    try:
+        ok = generate_classifications(shard, descriptions, system_prompt, engine_kwargs, results,
+                                      on_chunk=report_chunk)
+    except Exception as e:
+        print(f"Data-parallel worker {rank} failed: {e}")
+        ok = False
+    queue.put((rank, 'done', ok))
 
-    # Map back to DataFrame
-    print("Mapping results back to dataframe...")
-    
-    def get_attr(desc, attr):
-        if desc in results and isinstance(results[desc], dict):
-            return results[desc].get(attr, '')
-        return ''
+def visible_cuda_devices() -> List[str]:
+    """Return the CUDA devices this process may use, as CUDA_VISIBLE_DEVICES entries"""
+    visible = os.environ.get("CUDA_VISIBLE_DEVICES")
+    if visible is not None:
+        return [device.strip() for device in visible.split(",") if device.strip()]
+    return [str(device) for device in range(cuda_device_count())]
 
-    df['LLM_Body_Part'] = df['Study Description'].apply(lambda x: get_attr(x, 'body_part'))
-    df['LLM_Modality'] = df['Study Description'].apply(lambda x: get_attr(x, 'modality'))
-    df['LLM_Laterality'] = df['Study Description'].apply(lambda x: get_attr(x, 'laterality'))
-    df['LLM_Contrast'] = df['Study Description'].apply(lambda x: get_attr(x, 'contrast'))
+def generate_data_parallel(pending: List[str], descriptions: Dict[str, str], system_prompt: str,
+                           engine_kwargs: Dict, results: Dict, data_parallel_size: int,
+                           on_chunk: Optional[Callable[[List[str]], None]] = None) -> bool:
+    """
+    Classify pending descriptions with data_parallel_size independent engines
 
-    print(f"Writing results to {output_file}...")
-    df.to_excel(output_file, index=False)
-    print("Done!")
+    Each engine runs in its own process on its own slice of the visible
+    GPUs and classifies every data_parallel_size-th description. Results
+    are merged into results as each chunk finishes, and on_chunk is
+    called with the chunk's descriptions. Returns False if any engine
+    fails or dies; the other engines' results are still kept.
+    """
+    gpus = engine_kwargs['tensor_parallel_size']
+    devices = visible_cuda_devices()
+    if len(devices) < data_parallel_size * gpus:
+        print(f"Data parallelism {data_parallel_size} x {gpus} GPUs needs {data_parallel_size * gpus} "
+              f"GPUs, but {len(devices)} are visible.")
+        return False
+
+    # CUDA cannot be re-initialized in forked children
+    context = multiprocessing.get_context("spawn")
+    queue = context.Queue()
+    workers = []
+    for rank in range(data_parallel_size):
+        shard = pending[rank::data_parallel_size]
+        worker = context.Process(
+            target=_data_parallel_worker,
+            args=(rank, devices[rank * gpus:(rank + 1) * gpus], shard,
+                  {n: descriptions[n] for n in shard}, system_prompt, engine_kwargs, queue)
+        )
+        worker.start()
+        workers.append(worker)
+
+    # Drain the queue before joining so no worker blocks on a full pipe
+    ok = True
+    running = set(range(data_parallel_size))
+    exited = set()
+    while running:
+        try:
+            rank, kind, payload = queue.get(timeout=10)
+        except queue_module.Empty:
+            # A worker killed outright (out of memory, CUDA fault) never
+            # reports. Anything it sent before exiting is already in the
+            # pipe, so a rank is only given up after a further empty wait
+            dead = {rank for rank in running if not workers[rank].is_alive()}
+            for rank in dead & exited:
+                print(f"Data-parallel worker {rank} exited with code {workers[rank].exitcode}")
+                running.discard(rank)
+                ok = False
+            exited = dead
+            continue
+        if kind == 'chunk':
+            results.update(payload)
+            if on_chunk:
+                on_chunk(list(payload))
+        else:
+            running.discard(rank)
+            ok = ok and payload
+    for worker in workers:
+        worker.join()
+    return ok
 
 if __name__ == "__main__":
     import argparse
@@ -95,6 +461,29 @@ if __name__ == "__main__":
     parser.add_argument("--input", default="examples/rad_prepared.xlsx")
     parser.add_argument("--output", default="rad_llm_classified.xlsx")
     parser.add_argument("--model", default="aaditya/OpenBioLLM-Llama3-8B")
+    parser.add_argument("--cache", default=None, help="JSON file caching classifications across runs")
+    parser.add_argument("--quantization", default=None, choices=["fp8", "compressed-tensors", "awq", "gptq"],
+                        help="Quantization of the model checkpoint, e.g. fp8 with "
+                             "neuralmagic/Qwen2.5-3B-Instruct-FP8, compressed-tensors for an INT8 W8A8 "
+                             "checkpoint, awq/gptq for W4A16 (default: FP16)")
+    parser.add_argument("--format", default=None, choices=["xlsx", "parquet", "feather", "csv"],
+                        help="Output format (default: from the --output suffix)")
+    parser.add_argument("--low-mem", action="store_true",
+                        help="Leave memory headroom (e.g. Mac with 16GB) instead of tuning for throughput")
+    parser.add_argument("--tp", type=int, default=0,
+                        help="Tensor-parallel GPUs (default: all visible). A model that fits on one "
+                             "GPU (e.g. 3B) is usually fastest with --tp 1; more only helps when the "
+                             "weights or KV cache outgrow a single GPU")
+    parser.add_argument("--dp", type=int, default=1,
+                        help="Data-parallel engines, one per GPU (or per --tp GPUs), each "
+                             "classifying a shard of the descriptions")
+    parser.add_argument("--kv-cache-dtype", default="auto", choices=["auto", "fp8", "fp8_e4m3", "fp8_e5m2"],
+                        help="KV cache dtype (default: the model dtype). fp8 halves KV cache memory "
+                             "and bandwidth at some accuracy cost, using E4M3 on Ada/Hopper and "
+                             "E5M2 on older GPUs")
     args = parser.parse_args()
+    if args.format:
+        args.output = str(Path(args.output).with_suffix(f".{args.format}"))
     
-    classify_studies(args.input, args.output, args.model)
+    classify_studies(args.input, args.output, args.model, args.cache, args.quantization, args.low_mem,
+                     args.tp, args.dp, args.kv_cache_dtype)